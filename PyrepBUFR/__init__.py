@@ -1,14 +1,24 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import repeat
+from os import cpu_count
+from os.path import exists
 from re import search
 from textwrap import wrap
 
-from .debug import dump_hex
-from .external import array, ceil, zeros, floor
+from .debug import dump_hex, hex_lines
+from .external import array, ceil, zeros
 from .operators import Operator
-from .replication import Replication, DelayedReplication
+from .replication import Replication, DelayedReplication, EventStack, check_events
 from .tables import BUFRDataType, ElementDefinition, parse_int, Table, SequenceDefinition, SequenceElement
 from .tables.default import default_table
-from .values import BUFRSubset, SubsetCollection, MessageCollection
-from .utility import read_integer, read_integers
+from .index import FileIndex
+from .query import match_record, split_predicates
+from .stats import count, stage
+from .values import BUFRLookupTable, BUFRSubset, EventSequence, SubsetCollection, MessageCollection
+from .utility import copy_bits, encode_message, encode_section, read_integer, read_integers
+from .utility.io import PathFile, copy_at, read_at
 
 DEBUG_LEVEL = 0
 
@@ -18,6 +28,17 @@ class InvalidBUFRMessage(Exception):
 class ClosedBUFRFile(Exception):
     pass
 
+MessageHeader = namedtuple('MessageHeader', ('bufr_edition', 'bufr_master_table', 'originating_center', 'originating_subcenter',
+                                             'data_category', 'local_sub_category', 'master_table_version', 'local_table_version',
+                                             'year', 'month', 'day', 'hour', 'minute', 'second', 'number_of_subsets'))
+
+class MessageHandle(namedtuple('MessageHandle', ('path', 'offset', 'length', 'header', 'table_key'))):
+    __slots__ = ()
+    def open(self, table_source=default_table, table_cache=None, fobj=None):
+        if fobj is None:
+            fobj = PathFile(self.path)
+        return BUFRMessage(fobj, table_source=table_source, file_offset=self.offset, table_cache=table_cache)
+
 class BitMap(object):
     def __init__(self, byte_array):
         self.__byte_array__ = byte_array
@@ -26,40 +47,71 @@ class BitMap(object):
         self.cursor = position
     def __repr__(self):
         return dump_hex(self.__byte_array__, 1e45)
+    def __reduce__(self):
+        return (BitMap, (bytes(self.__byte_array__),), {'cursor': self.cursor})
     def read(self, length):
-        start_byte = int(floor( self.cursor / 8 ))
-        
-        end_byte = int(ceil((self.cursor + length) / 8))
+        length = int(length)
+        cursor = int(self.cursor)
+        value = (int.from_bytes(self.__byte_array__[cursor >> 3:(cursor + length + 7) >> 3], 'big') >> (-(cursor + length) % 8)) & ((1 << length) - 1)
+        self.cursor = cursor + length
+        return value.to_bytes((length + 7) >> 3, 'big')
 
-        value_length = int(ceil(length / 8.0))
+def message_metadata(message_number, message):
+    return {
+        'message_number': message_number,
+        'nominal_year': message.file_year,
+        'nominal_month': message.file_month,
+        'nominal_day': message.file_day,
+        'nominal_hour': message.file_hour,
+        'nominal_minute': message.file_minute,
+        'nominal_second': message.file_second
+    }
 
-        bit_mask = sum([2**(((end_byte - start_byte) * 8) - i - 1) for i in range(self.cursor % 8, self.cursor % 8 + length)])
-        bit_shift = (((end_byte - start_byte) * 8) - (self.cursor % 8 + int(length)))
+def decode_message(message_number, message, events='all'):
+    subsets = message.read_subsets(events=events)
+    subsets.metadata.update(message_metadata(message_number, message))
+    return subsets
 
-        value = ((int.from_bytes(self.__byte_array__[start_byte:end_byte], 'big') & bit_mask) >> bit_shift).to_bytes(value_length, 'big')
-        self.cursor += int(length)
-        return value
+def decode_message_range(filename, first_message_number, handles, tables, events='all'):
+    output = []
+    with open(filename, 'rb') as fobj:
+        for message_number, handle, message_tables in zip(range(first_message_number, first_message_number + len(handles)), handles, tables):
+            message = handle.open(table_source=None, table_cache={handle.table_key: message_tables}, fobj=fobj)
+            output.append(decode_message(message_number, message, events))
+    return output
 
 class BUFRFile(object):
-    def __init__(self, filename, table_source=default_table):
+    def __init__(self, filename, table_source=default_table, workers=None, events='all', stats=None):
         self.__table_source__ = table_source
+        self.stats = stats
         if type(filename) == str:
             self.__fobj__ = open(filename, 'rb')
         else:
             self.__fobj__ = filename
+        self.__filename__ = getattr(self.__fobj__, 'name', None)
+        self.workers = workers
+        self.events = check_events(events)
+        self.__table_cache__ = {}
+        self.__index__ = None
         self.messages = []
+        self.table_messages = []
         message_offset = 0
         continue_reading = True
-        while continue_reading:
-            try:
-                message = BUFRMessage(self.__fobj__, table_source=self.__table_source__, file_offset=message_offset)
-                message_offset = message.__section_start__[0] + message.__section_start__[6]
-                if message.data_category == 11:
-                    self.__process_prepbufr_table__(message)
-                else:
-                    self.messages.append(message)
-            except InvalidBUFRMessage:
-                continue_reading = False
+        with stage(self.stats, 'scan'):
+            while continue_reading:
+                try:
+                    message = BUFRMessage(self.__fobj__, table_source=self.__table_source__, file_offset=message_offset, table_cache=self.__table_cache__, stats=self.stats)
+                    message_offset = message.__section_start__[0] + message.__section_start__[6]
+                    if message.data_category == 11:
+                        with stage(self.stats, 'dx_tables'):
+                            self.__process_prepbufr_table__(message)
+                        self.table_messages.append(message)
+                    else:
+                        self.messages.append(message)
+                except InvalidBUFRMessage:
+                    continue_reading = False
+        count(self.stats, 'messages', len(self.messages))
+        count(self.stats, 'table_messages', len(self.table_messages))
         if len(self.messages) == 0:
             raise InvalidBUFRMessage('File contains no valid BUFR messages')
     def __enter__(self):
@@ -67,31 +119,40 @@ class BUFRFile(object):
     def __exit__(self, type, value, tb):
         self.close()
     def __str__(self):
-        output = ''
+        output = StringIO()
+        self.write_dump(output)
+        return output.getvalue()
+    def write_dump(self, out_file, hex_bytes=None, values=False):
         for i, message in enumerate(self.messages):
-            output +=  '\n\n' + '*'* 50 + '\n*' + ' ' * 48 + '*\n*' + '{0: ^48s}'.format('Message {0:d}'.format(i)) + '*\n*' + ' ' * 48 + '*\n' + '*' * 50 + '\n\n' + str(message)
-        return output
+            out_file.write('\n\n' + '*'* 50 + '\n*' + ' ' * 48 + '*\n*' + '{0: ^48s}'.format('Message {0:d}'.format(i)) + '*\n*' + ' ' * 48 + '*\n' + '*' * 50 + '\n\n')
+            message.write_dump(out_file, hex_bytes=hex_bytes, values=values, events=self.events)
 
     def __process_prepbufr_table__(self, message):
-        table_ax = self.__table_source__.dynamic_table('A')
-        table_bx = self.__table_source__.dynamic_table('B')
-        table_dx = self.__table_source__.dynamic_table('D')
+        BUFRFile.process_prepbufr_table(self.__table_source__, message)
+        self.__table_cache__ = {}
+
+    @staticmethod
+    def process_prepbufr_table(table_source, message):
+        table_ax = table_source.dynamic_table('A')
+        table_bx = table_source.dynamic_table('B')
+        table_dx = table_source.dynamic_table('D')
         message_descriptors = message.expand_descriptors(message.data_descriptors)
         message_bitmap      = message.section_4_data_bytes
         for i in range(len(message_descriptors)):
             value = message_descriptors[i].read_value(message_bitmap)
             for k in range(1, value.group_count):
                 if value.groups[k][0].mnemonic == 'TABLAE':
-                    table_ax.append(self.__parse_table_a_entry__(*value.groups[k]))
+                    table_ax.append(BUFRFile.__parse_table_a_entry__(*value.groups[k]))
                 elif value.groups[k][0].mnemonic == 'FDESC' and value.groups[k][3].mnemonic == 'ELEMNA1':
                     try:
-                        table_bx.append(self.__parse_table_b_entry__(*value.groups[k]))
+                        table_bx.append(BUFRFile.__parse_table_b_entry__(*value.groups[k]))
                     except:
                         print(value.groups[k])
                 elif value.groups[k][0].mnemonic == 'FDESC' and value.groups[k][3].mnemonic == 'OPER5':
-                    table_dx.append(self.__parse_table_d_entry__(*value.groups[k]))
+                    table_dx.append(BUFRFile.__parse_table_d_entry__(*value.groups[k]))
 
-    def __parse_table_a_entry__(self, table_a_entry, table_a_description_1, table_a_description_2):
+    @staticmethod
+    def __parse_table_a_entry__(table_a_entry, table_a_description_1, table_a_description_2):
         return_value = None
         description = table_a_description_1.data_raw + table_a_description_2.data_raw
         match = search(r'([^\s]+)\s+(.*)', description)
@@ -99,7 +160,8 @@ class BUFRFile(object):
             return_value = BUFRDataType(table_a_entry.data, match.group(2).strip())
         return return_value
 
-    def __parse_table_b_entry__(self, f_descriptor, x_descriptor, y_descriptor,
+    @staticmethod
+    def __parse_table_b_entry__(f_descriptor, x_descriptor, y_descriptor,
                             element_name_1, element_name_2, units_name,
                             scale_sign, scale, reference_sign, reference,
                             element_data_width):
@@ -113,7 +175,8 @@ class BUFRFile(object):
                                         element_data_width.data, units_name.data.strip(), match.group(1).strip(), match.group(2).strip())
         return element
 
-    def __parse_table_d_entry__(self, f_descriptor, x_descriptor, y_descriptor,
+    @staticmethod
+    def __parse_table_d_entry__(f_descriptor, x_descriptor, y_descriptor,
                             sequence_name, *sequence_descriptors):
         element = None
         match = search(r'([\w\d]+)(?:[\s]+([^\n]+))?', sequence_name.data_raw)
@@ -126,70 +189,156 @@ class BUFRFile(object):
 
     @property
     def data(self):
-        message_collection = MessageCollection()
+        if self.workers is not None and self.workers > 1:
+            return self.data_parallel(self.workers)
+        message_collection = MessageCollection(stats=self.stats)
         for message_number, message in enumerate(self.messages):
-            subsets = message.subsets
-            subsets.metadata['message_number'] = message_number
-            subsets.metadata['nominal_year'] = message.file_year
-            subsets.metadata['nominal_month'] = message.file_month
-            subsets.metadata['nominal_day'] = message.file_day
-            subsets.metadata['nominal_hour'] = message.file_hour
-            subsets.metadata['nominal_minute'] = message.file_minute
-            subsets.metadata['nominal_second'] = message.file_second
+            message_collection.append(decode_message(message_number, message, self.events))
+        return message_collection
+
+    @property
+    def filename(self):
+        return self.__filename__
+
+    @property
+    def index(self):
+        if self.__index__ is None:
+            self.__index__ = FileIndex.build(self)
+        return self.__index__
+
+    def build_index(self, index_path=None):
+        self.__index__ = None
+        if index_path is not None and exists(index_path):
+            index = FileIndex.read(index_path)
+            if index.matches(self):
+                self.__index__ = index
+        if self.__index__ is None:
+            self.__index__ = FileIndex.build(self)
+            if index_path is not None:
+                self.__index__.write(index_path)
+        return self.__index__
+
+    def read_locations(self, locations):
+        message_collection = MessageCollection(stats=self.stats)
+        message_locations = {}
+        for message_number, subset_number, bit_offset in locations:
+            message_locations.setdefault(message_number, []).append((subset_number, bit_offset))
+        for message_number in sorted(message_locations):
+            message = self.messages[message_number]
+            subsets = message.read_subsets(subset_offsets=message_locations[message_number], events=self.events)
+            subsets.metadata.update(message_metadata(message_number, message))
             message_collection.append(subsets)
         return message_collection
 
+    def within(self, latitude_range, longitude_range):
+        return self.read_locations(self.index.locations(self.index.spatial.within(latitude_range, longitude_range)))
+
+    def near(self, latitude, longitude, radius):
+        return self.read_locations(self.index.locations(self.index.spatial.near(latitude, longitude, radius)))
+
+    def station(self, *station_ids):
+        return self.read_locations(self.index.locations(self.index.station(*station_ids)))
+
+    def between(self, start_time, end_time):
+        return self.read_locations(self.index.locations(self.index.between(start_time, end_time)))
+
+    def query(self, select=None, where=None):
+        where = {} if where is None else where
+        records = []
+        for message_number, message in enumerate(self.messages):
+            header = dict(message.header._asdict(), **message_metadata(message_number, message))
+            with stage(self.stats, 'expand'):
+                descriptors = message.expand_descriptors(message.data_descriptors, events=self.events)
+            header_predicates, subset_predicates, value_predicates, missing_keys = split_predicates(where, header, descriptors)
+            if len(missing_keys) > 0 or not match_record(header_predicates, header):
+                continue
+            subsets = message.read_subsets(descriptors=descriptors, predicates=subset_predicates)
+            subsets.metadata.update(message_metadata(message_number, message))
+            filter_keys = None if select is None else list(select) + list(value_predicates)
+            with stage(self.stats, 'rows'):
+                message_records = subsets.to_dict(filter_keys=filter_keys)
+            count(self.stats, 'rows', len(message_records))
+            for record in message_records:
+                if match_record(value_predicates, record):
+                    records.append(record if select is None else dict([(k, v) for k, v in record.items() if k in select]))
+        return records
+
+    def write_messages(self, out_file, predicate=None):
+        if type(out_file) == str:
+            with open(out_file, 'wb') as fobj:
+                return self.write_messages(fobj, predicate)
+        selected = []
+        for message_number, message in enumerate(self.messages):
+            if predicate is None:
+                selected.append(message)
+            elif callable(predicate):
+                if predicate(message.header):
+                    selected.append(message)
+            elif match_record(predicate, dict(message.header._asdict(), **message_metadata(message_number, message))):
+                selected.append(message)
+        ranges = []
+        for message in sorted(self.table_messages + selected, key=lambda x: int(x.__section_start__[0])):
+            offset, length = int(message.__section_start__[0]), int(message.__section_start__[6])
+            if len(ranges) > 0 and ranges[-1][0] + ranges[-1][1] == offset:
+                ranges[-1][1] += length
+            else:
+                ranges.append([offset, length])
+        for offset, length in ranges:
+            copy_at(self.__fobj__, out_file, offset, length)
+        return len(selected)
+
+    def write_subsets(self, out_file, locations):
+        if type(out_file) == str:
+            with open(out_file, 'wb') as fobj:
+                return self.write_subsets(fobj, locations)
+        message_subsets = {}
+        for location in locations:
+            message_subsets.setdefault(location[0], set()).add(location[1])
+        selected = [(self.messages[message_number], sorted(subset_numbers)) for message_number, subset_numbers in message_subsets.items()]
+        subset_count = 0
+        for message, subset_numbers in sorted([(message, None) for message in self.table_messages] + selected, key=lambda x: int(x[0].__section_start__[0])):
+            if subset_numbers is None:
+                copy_at(self.__fobj__, out_file, message.__section_start__[0], message.__section_start__[6])
+            else:
+                out_file.write(message.extract_subsets(subset_numbers))
+                subset_count += len(subset_numbers)
+        return subset_count
+
+    def data_parallel(self, workers=None):
+        if type(self.__filename__) != str:
+            raise ValueError('Parallel decoding requires a BUFR file opened from a path')
+        if workers is None:
+            workers = self.workers if self.workers is not None else cpu_count()
+        handles = [message.handle for message in self.messages]
+        compact_tables = {}
+        tables = []
+        for message in self.messages:
+            key = (id(message.__table_b__), tuple([tuple(x) for x in message.data_descriptors]))
+            if key not in compact_tables:
+                compact_tables[key] = message.compact_tables()
+            tables.append(compact_tables[key])
+        chunk_size = max(int(ceil(len(handles) / workers)), 1)
+        first_message_numbers = list(range(0, len(handles), chunk_size))
+        message_collection = MessageCollection(stats=self.stats)
+        with stage(self.stats, 'decode'), ProcessPoolExecutor(max_workers=min(workers, len(first_message_numbers))) as executor:
+            for subsets in executor.map(decode_message_range,
+                                        repeat(self.__filename__),
+                                        first_message_numbers,
+                                        [handles[i:i+chunk_size] for i in first_message_numbers],
+                                        [tables[i:i+chunk_size] for i in first_message_numbers],
+                                        repeat(self.events)):
+                message_collection.extend(subsets)
+        return message_collection
+
     def close(self):
         self.__fobj__.close()
 
-class BUFRMessage(object):
-    def __init__(self, filename, table_source=default_table, file_offset=0):
-        self.__table_source__ = table_source
-        if type(filename) == str:
-            self.__fobj__ = open(filename, 'rb')
-        else:
-            self.__fobj__ = filename
+class DescriptorTables(object):
+    def __resolve_tables__(self):
         self.__table_a__ = Table.create('A', None, None, None)
         self.__table_b__ = Table.create('B', None, None, None)
         self.__table_d__ = Table.create('D', None, None, None)
         self.__table_f__ = Table.create('F', None, None, None)
-        self.__section_start__ = zeros(7, dtype='uint32')
-        self.__section_start__[0] = file_offset
-        start_word = self.__fobj__.read(4)
-        file_start = start_word == b'BUFR'
-        while not file_start:
-            if DEBUG_LEVEL > 2:
-                print('Seeking ahead')
-            self.__section_start__[0] += 1
-            self.__fobj__.seek(self.__section_start__[0])
-            start_word = self.__fobj__.read(4)
-            file_start = start_word == b'BUFR'
-            if start_word == b'':
-                break
-
-        if not file_start:
-            raise InvalidBUFRMessage('File contains no valid BUFR messages')
-    
-        if DEBUG_LEVEL > 1:
-            print('Found start')
-        self.__fobj__.seek(self.__section_start__[0] + 4)
-        self.__section_start__[6] = read_integer(b'\x00' + self.__fobj__.read(3))
-        self.bufr_edition = read_integer(self.__fobj__.read(1))
-        self.__section_start__[1] = self.__section_start__[0] + 8
-        self.__fobj__.seek(self.__section_start__[1] + (9 if self.bufr_edition == 4 else 7))
-        self.section_2_present = read_integer(self.__fobj__.read(1))
-        if self.section_2_present:
-            self.__fobj__.seek(self.__section_start__[1])
-            self.__section_start__[2] = self.__section_start__[1] + read_integer(b'\x00' + self.__fobj__.read(3))
-            self.__fobj__.seek(self.__section_start__[2])
-            self.__section_start__[3] = self.__section_start__[2] + read_integer(b'\x00' + self.__fobj__.read(3))
-        else:
-            self.__fobj__.seek(self.__section_start__[1])
-            self.__section_start__[3] = self.__section_start__[1] + read_integer(b'\x00' + self.__fobj__.read(3))
-        self.__fobj__.seek(self.__section_start__[3])
-        self.__section_start__[4] = self.__section_start__[3] + read_integer(b'\x00' + self.__fobj__.read(3))
-        self.__fobj__.seek(self.__section_start__[4])
-        self.__section_start__[5] = self.__section_start__[4] + read_integer(b'\x00' + self.__fobj__.read(3)) - 4
         if DEBUG_LEVEL > 1:
             print('Initializing Table A')
         for table in (self.__table_source__.construct_table_version('A', 0, master_table=self.bufr_master_table)
@@ -214,18 +363,161 @@ class BUFRMessage(object):
                     + self.__table_source__.construct_table_version('F', self.local_table_version,  master_table=self.bufr_master_table, originating_center=self.originating_center)
                     + self.__table_source__.construct_table_version('FX', 0)).values():
             self.__table_f__.append(table)
+
+    @property
+    def table_key(self):
+        return (self.bufr_master_table, self.originating_center, self.master_table_version, self.local_table_version)
+    @property
+    def tables(self):
+        return (self.__table_a__, self.__table_b__, self.__table_d__, self.__table_f__)
+
+    def expand_descriptors(self, file_descriptors, events='all'):
+        check_events(events)
+        expanded_descriptors = []
+        number_of_descriptors = len(file_descriptors)
+        i = 0
         
+        while i < number_of_descriptors:
+            file_descriptor = file_descriptors[i]
+            if file_descriptor[0] == 0:
+                element = self.__table_b__.find(lambda id: id.f==file_descriptor[0] and id.x==file_descriptor[1] and id.y==file_descriptor[2])
+                if not element.is_empty:
+                    element = element.iloc(0)
+                    expanded_descriptors.append(element)
+            elif file_descriptor[0] == 1:
+                if file_descriptor[2] == 0:
+                    expanded_descriptors.append(DelayedReplication(file_descriptor[0], file_descriptor[1], file_descriptor[2], self.expand_descriptors(file_descriptors[i+2:i+file_descriptor[1]+2], events), self.expand_descriptors(file_descriptors[i+1:i+2])[0]))
+                    i += file_descriptor[1]+1
+                else:
+                    expanded_descriptors.append(Replication(file_descriptor[0], file_descriptor[1], file_descriptor[2], data_elements=self.expand_descriptors(file_descriptors[i+1:i+file_descriptor[1]+1], events)))
+                    i += file_descriptor[1]
+            elif file_descriptor[0] == 2:
+                if file_descriptor[1] == 5:
+                    expanded_descriptors.append(Operator.create(file_descriptor[0], file_descriptor[1], file_descriptor[2]))
+                elif file_descriptor[1] == 6:
+                    operator = Operator.create(file_descriptor[0], file_descriptor[1], file_descriptor[2])
+                    expanded_descriptors.append(operator.apply(self.expand_descriptors(file_descriptors[i+1:i+2])[0]))
+                    i += 1
+            elif file_descriptor[0] == 3:
+                sequence = self.__table_d__.find(lambda id: id.f==file_descriptor[0] and id.x==file_descriptor[1] and id.y==file_descriptor[2])
+                if not sequence.is_empty:
+                    if sequence.iloc(0).mnemonic == 'DRPSTAK' and events != 'all':
+                        delayed_replication_sequence = sequence.iloc(0).get_descriptors()
+                        event_sequence = self.__table_d__.find(lambda id: id.f==file_descriptors[i+1][0] and id.x==file_descriptors[i+1][1] and id.y==file_descriptors[i+1][2])
+                        expanded_descriptors.append(EventStack(delayed_replication_sequence[0][0], delayed_replication_sequence[0][1], delayed_replication_sequence[0][2], self.expand_descriptors(file_descriptors[i+1:i+delayed_replication_sequence[0][1]+1], events), self.expand_descriptors(delayed_replication_sequence[1:2])[0],
+                                                               mnemonic=event_sequence.iloc(0).mnemonic if not event_sequence.is_empty else 'DRPSTAK', events=events))
+                        i += delayed_replication_sequence[0][1]
+                    elif sequence.iloc(0).mnemonic in ['DRP16BIT', 'DRP8BIT', 'DRP1BIT', 'DRPSTAK']:
+                        delayed_replication_sequence = sequence.iloc(0).get_descriptors()
+                        expanded_descriptors.append(DelayedReplication(delayed_replication_sequence[0][0], delayed_replication_sequence[0][1], delayed_replication_sequence[0][2], self.expand_descriptors(file_descriptors[i+1:i+delayed_replication_sequence[0][1]+1], events), self.expand_descriptors(delayed_replication_sequence[1:2])[0]))
+                        i += delayed_replication_sequence[0][1]
+                    else:
+                        sequence = self.expand_descriptors(sequence.iloc(0).get_descriptors(), events)
+                        expanded_descriptors.extend(sequence)
+            i += 1
+        return expanded_descriptors
+
+
+class BUFRMessage(DescriptorTables):
+    def __init__(self, filename, table_source=default_table, file_offset=0, table_cache=None, stats=None):
+        self.__table_source__ = table_source
+        self.stats = stats
+        if type(filename) == str:
+            self.__fobj__ = open(filename, 'rb')
+        else:
+            self.__fobj__ = filename
+        self.__section_start__ = zeros(7, dtype='uint32')
+        self.__section_start__[0] = file_offset
+        start_word = self.__read__(self.__section_start__[0], 4)
+        file_start = start_word == b'BUFR'
+        while not file_start:
+            if DEBUG_LEVEL > 2:
+                print('Seeking ahead')
+            search_block = self.__read__(self.__section_start__[0], 65536)
+            start_position = search_block.find(b'BUFR')
+            if start_position > -1:
+                self.__section_start__[0] += start_position
+                file_start = True
+            elif len(search_block) < 4:
+                break
+            else:
+                self.__section_start__[0] += len(search_block) - 3
+
+        if not file_start:
+            raise InvalidBUFRMessage('File contains no valid BUFR messages')
+    
+        if DEBUG_LEVEL > 1:
+            print('Found start')
+        self.__section_start__[6] = read_integer(b'\x00' + self.__read__(self.__section_start__[0] + 4, 3))
+        self.bufr_edition = read_integer(self.__read__(self.__section_start__[0] + 7, 1))
+        self.__section_start__[1] = self.__section_start__[0] + 8
+        self.section_2_present = read_integer(self.__read__(self.__section_start__[1] + (9 if self.bufr_edition == 4 else 7), 1))
+        if self.section_2_present:
+            self.__section_start__[2] = self.__section_start__[1] + read_integer(b'\x00' + self.__read__(self.__section_start__[1], 3))
+            self.__section_start__[3] = self.__section_start__[2] + read_integer(b'\x00' + self.__read__(self.__section_start__[2], 3))
+        else:
+            self.__section_start__[3] = self.__section_start__[1] + read_integer(b'\x00' + self.__read__(self.__section_start__[1], 3))
+        self.__section_start__[4] = self.__section_start__[3] + read_integer(b'\x00' + self.__read__(self.__section_start__[3], 3))
+        self.__section_start__[5] = self.__section_start__[4] + read_integer(b'\x00' + self.__read__(self.__section_start__[4], 3)) - 4
+        if table_cache is not None and self.table_key in table_cache:
+            self.__table_a__, self.__table_b__, self.__table_d__, self.__table_f__ = table_cache[self.table_key]
+            count(self.stats, 'table_cache_hits')
+        else:
+            with stage(self.stats, 'tables'):
+                self.__resolve_tables__()
+            count(self.stats, 'table_constructions')
+            if table_cache is not None:
+                table_cache[self.table_key] = self.tables
+
+    def __reduce__(self):
+        return (MessageHandle.open, (self.handle, None, {self.table_key: self.compact_tables()}))
+
+    def compact_tables(self):
+        table_b = Table.create('B', None, None, None)
+        table_d = Table.create('D', None, None, None)
+        table_f = Table.create('F', None, None, None)
+        element_ids = set()
+        pending = [tuple(x) for x in self.data_descriptors]
+        while len(pending) > 0:
+            descriptor = pending.pop()
+            if descriptor[0] == 0 and descriptor not in element_ids:
+                element_ids.add(descriptor)
+                if descriptor in self.__table_b__:
+                    table_b.append(self.__table_b__[descriptor])
+            elif descriptor[0] == 3 and descriptor not in table_d and descriptor in self.__table_d__:
+                table_d.append(self.__table_d__[descriptor])
+                pending.extend([tuple(x) for x in self.__table_d__[descriptor].get_descriptors()])
+        for id, code_flag in self.__table_f__.items():
+            if id[0:3] in element_ids or id[4:7] in element_ids:
+                table_f.append(code_flag)
+        table_a = Table.create('A', None, None, None)
+        for id, data_type in self.__table_a__.items():
+            if id.code == self.data_category:
+                table_a.append(data_type)
+        return (table_a, table_b, table_d, table_f)
+    @property
+    def header(self):
+        return MessageHeader(self.bufr_edition, self.bufr_master_table, self.originating_center, self.originating_subcenter,
+                             self.data_category, self.local_sub_category, self.master_table_version, self.local_table_version,
+                             self.file_year, self.file_month, self.file_day, self.file_hour, self.file_minute, self.file_second,
+                             self.number_of_subsets)
+    @property
+    def handle(self):
+        return MessageHandle(getattr(self.__fobj__, 'name', None), int(self.__section_start__[0]), int(self.__section_start__[6]), self.header, self.table_key)
+
     def close(self):
         self.__fobj__.close()
 
+    def __read__(self, offset, length):
+        return read_at(self.__fobj__, offset, length)
+
     # Section 1 - Identification
     
     @property
     def bufr_master_table(self):
         if self.__fobj__.closed:
             raise ClosedBUFRFile('File already closed.')
-        self.__fobj__.seek(self.__section_start__[1] + 3)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + 3, 1))
     @property
     def originating_center(self):
         if self.__fobj__.closed:
@@ -234,12 +526,11 @@ class BUFRMessage(object):
             offset = 5
         elif self.bufr_edition == 4:
             offset = 4
-        self.__fobj__.seek(self.__section_start__[1] + offset)
         value = 0
         if self.bufr_edition == 3:
-            value = read_integer(self.__fobj__.read(1))
+            value = read_integer(self.__read__(self.__section_start__[1] + offset, 1))
         elif self.bufr_edition == 4:
-            value = read_integer(self.__fobj__.read(2))
+            value = read_integer(self.__read__(self.__section_start__[1] + offset, 2))
         return value
     @property
     def originating_subcenter(self):
@@ -249,12 +540,11 @@ class BUFRMessage(object):
             offset = 4
         elif self.bufr_edition == 4:
             offset = 6
-        self.__fobj__.seek(self.__section_start__[1] + offset)
         value = 0
         if self.bufr_edition == 3:
-            value = read_integer(self.__fobj__.read(1))
+            value = read_integer(self.__read__(self.__section_start__[1] + offset, 1))
         elif self.bufr_edition == 4:
-            value = read_integer(self.__fobj__.read(2))
+            value = read_integer(self.__read__(self.__section_start__[1] + offset, 2))
         return value
     @property
     def update_sequence_number(self):
@@ -263,8 +553,7 @@ class BUFRMessage(object):
         offset = 6
         if self.bufr_edition == 4:
             offset += 2
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(2))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 2))
     @property
     def data_category(self):
         if self.__fobj__.closed:
@@ -272,8 +561,7 @@ class BUFRMessage(object):
         offset = 8
         if self.bufr_edition == 4:
             offset += 2
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def data_category_description(self):
         description = ''
@@ -288,8 +576,7 @@ class BUFRMessage(object):
         value = None
         if self.bufr_edition == 4:
             offset = 11
-            self.__fobj__.seek(self.__section_start__[1] + offset)
-            value = read_integer(self.__fobj__.read(1))
+            value = read_integer(self.__read__(self.__section_start__[1] + offset, 1))
         return value
     @property
     def local_sub_category(self):
@@ -300,8 +587,7 @@ class BUFRMessage(object):
         if self.bufr_edition == 4:
             offset = 12
         
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def master_table_version(self):
         if self.__fobj__.closed:
@@ -309,8 +595,7 @@ class BUFRMessage(object):
         offset = 10
         if self.bufr_edition == 4:
             offset += 3
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def local_table_version(self):
         if self.__fobj__.closed:
@@ -318,8 +603,7 @@ class BUFRMessage(object):
         offset = 11
         if self.bufr_edition == 4:
             offset += 3
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def file_date(self):
         if self.__fobj__.closed:
@@ -327,14 +611,13 @@ class BUFRMessage(object):
         offset = 12
         if self.bufr_edition == 4:
             offset += 3
-        self.__fobj__.seek(self.__section_start__[1] + offset)
         if self.bufr_edition == 3:
-            year = read_integer(self.__fobj__.read(1))
-            month, day, hour, minute = read_integers(self.__fobj__.read(4), 1)
+            year = read_integer(self.__read__(self.__section_start__[1] + offset, 1))
+            month, day, hour, minute = read_integers(self.__read__(self.__section_start__[1] + offset + 1, 4), 1)
             second = 0
         elif self.bufr_edition == 4:
-            year = read_integer(self.__fobj__.read(2))
-            month, day, hour, minute, second = read_integers(self.__fobj__.read(5), 1)
+            year = read_integer(self.__read__(self.__section_start__[1] + offset, 2))
+            month, day, hour, minute, second = read_integers(self.__read__(self.__section_start__[1] + offset + 2, 5), 1)
         return (year, month, day, hour, minute, second)
     
     @property
@@ -344,12 +627,11 @@ class BUFRMessage(object):
         offset = 12
         if self.bufr_edition == 4:
             offset += 3
-        self.__fobj__.seek(self.__section_start__[1] + offset)
         year = parse_int(0, 2)
         if self.bufr_edition == 3:
-            year = read_integer(self.__fobj__.read(1))
+            year = read_integer(self.__read__(self.__section_start__[1] + offset, 1))
         elif self.bufr_edition == 4:
-            year = read_integer(self.__fobj__.read(2))
+            year = read_integer(self.__read__(self.__section_start__[1] + offset, 2))
         return year if year > 1500 else (2000 + year if year < 70 else 1900 + year)
 
     @property
@@ -359,8 +641,7 @@ class BUFRMessage(object):
         offset = 13
         if self.bufr_edition == 4:
             offset += 4
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def file_day(self):
         if self.__fobj__.closed:
@@ -368,8 +649,7 @@ class BUFRMessage(object):
         offset = 14
         if self.bufr_edition == 4:
             offset += 4
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def file_hour(self):
         if self.__fobj__.closed:
@@ -377,8 +657,7 @@ class BUFRMessage(object):
         offset = 15
         if self.bufr_edition == 4:
             offset += 4
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def file_minute(self):
         if self.__fobj__.closed:
@@ -386,8 +665,7 @@ class BUFRMessage(object):
         offset = 16
         if self.bufr_edition == 4:
             offset += 4
-        self.__fobj__.seek(self.__section_start__[1] + offset)
-        return read_integer(self.__fobj__.read(1))
+        return read_integer(self.__read__(self.__section_start__[1] + offset, 1))
     @property
     def file_second(self):
         if self.__fobj__.closed:
@@ -395,8 +673,7 @@ class BUFRMessage(object):
         value = parse_int(0, 1)
         if self.bufr_edition == 4:
             offset = 21
-            self.__fobj__.seek(self.__section_start__[1] + offset)
-            value = read_integer(self.__fobj__.read(1))
+            value = read_integer(self.__read__(self.__section_start__[1] + offset, 1))
         return value
     @property
     def section_1_local_data(self):
@@ -405,12 +682,11 @@ class BUFRMessage(object):
         offset = 17
         if self.bufr_edition == 4:
             offset += 5
-        self.__fobj__.seek(self.__section_start__[1] + offset)
         if self.section_2_present:
             end = self.__section_start__[2] - self.__section_start__[1] - offset
         else:
             end = self.__section_start__[3] - self.__section_start__[1] - offset
-        return self.__fobj__.read(end)
+        return self.__read__(self.__section_start__[1] + offset, end)
 
     # Section 2 - Optional
 
@@ -420,9 +696,8 @@ class BUFRMessage(object):
             raise ClosedBUFRFile('File already closed.')
         data = b''
         if self.section_2_present:
-            self.__fobj__.seek(self.__section_start__[2])
             end = self.__section_start__[3] - self.__section_start__[2] - 4
-            data = self.__fobj__.read(end)
+            data = self.__read__(self.__section_start__[2], end)
         return data
     
     # Section 3 - Data Description
@@ -431,28 +706,24 @@ class BUFRMessage(object):
     def number_of_subsets(self):
         if self.__fobj__.closed:
             raise ClosedBUFRFile('File already closed.')
-        self.__fobj__.seek(self.__section_start__[3] + 4)
-        return read_integer(self.__fobj__.read(2))
+        return read_integer(self.__read__(self.__section_start__[3] + 4, 2))
     @property
     def observed_data(self):
         if self.__fobj__.closed:
             raise ClosedBUFRFile('File already closed.')
-        self.__fobj__.seek(self.__section_start__[3] + 6)
-        return read_integer(self.__fobj__.read(1)) & 128 > 0
+        return read_integer(self.__read__(self.__section_start__[3] + 6, 1)) & 128 > 0
     @property
     def compressed(self):
         if self.__fobj__.closed:
             raise ClosedBUFRFile('File already closed.')
-        self.__fobj__.seek(self.__section_start__[3] + 6)
-        return read_integer(self.__fobj__.read(1)) & 64 > 0
+        return read_integer(self.__read__(self.__section_start__[3] + 6, 1)) & 64 > 0
     @property
     def data_descriptors(self):
         if self.__fobj__.closed:
             raise ClosedBUFRFile('File already closed.')
-        self.__fobj__.seek(self.__section_start__[3] + 7)
         end = self.__section_start__[4] - self.__section_start__[3] - 7
         end -= end % 2
-        data = read_integers(self.__fobj__.read(end), 2)
+        data = read_integers(self.__read__(self.__section_start__[3] + 7, end), 2)
         return array([array([(x & ( 3 << 14)) >> 14,
                              (x & (63 <<  8)) >>  8,
                              (x &        255)      ]) for x in data])
@@ -460,67 +731,131 @@ class BUFRMessage(object):
     def section_4_data_bytes(self):
         if self.__fobj__.closed:
             raise ClosedBUFRFile('File already closed.')
-        self.__fobj__.seek(self.__section_start__[4] + 4)
         end = self.__section_start__[5] - self.__section_start__[4]
-        return BitMap(self.__fobj__.read(end))
-
-    def expand_descriptors(self, file_descriptors):
-        expanded_descriptors = []
-        number_of_descriptors = len(file_descriptors)
-        i = 0
-        
-        while i < number_of_descriptors:
-            file_descriptor = file_descriptors[i]
-            if file_descriptor[0] == 0:
-                element = self.__table_b__.find(lambda id: id.f==file_descriptor[0] and id.x==file_descriptor[1] and id.y==file_descriptor[2])
-                if not element.is_empty:
-                    element = element.iloc(0)
-                    expanded_descriptors.append(element)
-            elif file_descriptor[0] == 1:
-                if file_descriptor[2] == 0:
-                    expanded_descriptors.append(DelayedReplication(file_descriptor[0], file_descriptor[1], file_descriptor[2], self.expand_descriptors(file_descriptors[i+2:i+file_descriptor[1]+2]), self.expand_descriptors(file_descriptors[i+1:i+2])[0]))
-                    i += file_descriptor[1]+1
-                else:
-                    expanded_descriptors.append(Replication(file_descriptor[0], file_descriptor[1], file_descriptor[2], data_elements=self.expand_descriptors(file_descriptors[i+1:i+file_descriptor[1]+1])))
-                    i += file_descriptor[1]
-            elif file_descriptor[0] == 2:
-                if file_descriptor[1] == 5:
-                    expanded_descriptors.append(Operator.create(file_descriptor[0], file_descriptor[1], file_descriptor[2]))
-                elif file_descriptor[1] == 6:
-                    operator = Operator.create(file_descriptor[0], file_descriptor[1], file_descriptor[2])
-                    expanded_descriptors.append(operator.apply(self.expand_descriptors(file_descriptors[i+1:i+2])[0]))
-                    i += 1
-            elif file_descriptor[0] == 3:
-                sequence = self.__table_d__.find(lambda id: id.f==file_descriptor[0] and id.x==file_descriptor[1] and id.y==file_descriptor[2])
-                if not sequence.is_empty:
-                    if sequence.iloc(0).mnemonic in ['DRP16BIT', 'DRP8BIT', 'DRP1BIT', 'DRPSTAK']:
-                        delayed_replication_sequence = sequence.iloc(0).get_descriptors()
-                        expanded_descriptors.append(DelayedReplication(delayed_replication_sequence[0][0], delayed_replication_sequence[0][1], delayed_replication_sequence[0][2], self.expand_descriptors(file_descriptors[i+1:i+delayed_replication_sequence[0][1]+1]), self.expand_descriptors(delayed_replication_sequence[1:2])[0]))
-                        i += delayed_replication_sequence[0][1]
-                    else:
-                        sequence = self.expand_descriptors(sequence.iloc(0).get_descriptors())
-                        expanded_descriptors.extend(sequence)
-            i += 1
-        return expanded_descriptors
+        return BitMap(self.__read__(self.__section_start__[4] + 4, end))
 
     @property
     def subsets(self):
+        return self.read_subsets()
+
+    def __probe_subset__(self, descriptors, message_bitmap, keys):
+        values = {}
+        for descriptor in descriptors:
+            if descriptor.mnemonic in keys and not issubclass(descriptor.__class__, Replication):
+                value = descriptor.read_value(message_bitmap)
+                values[descriptor.mnemonic] = value.data_raw if issubclass(value.__class__, BUFRLookupTable) else value.data
+            else:
+                descriptor.skip_value(message_bitmap)
+        return values
+
+    def __match_subset__(self, descriptors, message_bitmap, predicates):
+        return match_record(predicates, self.__probe_subset__(descriptors, message_bitmap, predicates))
+
+    def __read_compressed__(self, descriptors, keys=None):
         message_bitmap = self.section_4_data_bytes
-        descriptors = self.expand_descriptors(self.data_descriptors)
-        
-        subsets_collection = SubsetCollection()
+        number_of_subsets = self.number_of_subsets
+        subsets = [BUFRSubset(self.__table_f__) for i in range(number_of_subsets)]
+        records = [{} for i in range(number_of_subsets)]
+        for descriptor in descriptors:
+            values = descriptor.read_compressed(message_bitmap, number_of_subsets) if number_of_subsets > 0 else []
+            for subset, record, value in zip(subsets, records, values):
+                if value.__class__ == EventSequence:
+                    for event_value in value:
+                        subset.append(event_value)
+                else:
+                    subset.append(value)
+                if keys and descriptor.mnemonic in keys and not issubclass(descriptor.__class__, Replication):
+                    record[descriptor.mnemonic] = value.data_raw if issubclass(value.__class__, BUFRLookupTable) else value.data
+        count(self.stats, 'bits_read', message_bitmap.cursor)
+        return subsets, records
+
+    def scan_subsets(self, keys, descriptors=None):
+        message_bitmap = self.section_4_data_bytes
+        if descriptors is None:
+            with stage(self.stats, 'expand'):
+                descriptors = self.expand_descriptors(self.data_descriptors)
+        if self.compressed:
+            subsets, records = self.__read_compressed__(descriptors, keys)
+            for subset_number, record in enumerate(records):
+                yield (subset_number, None, record)
+            return
+        for subset_number in range(self.number_of_subsets):
+            bit_offset = message_bitmap.cursor
+            yield (subset_number, bit_offset, self.__probe_subset__(descriptors, message_bitmap, keys))
 
+    def subset_bit_offsets(self, descriptors=None):
+        message_bitmap = self.section_4_data_bytes
+        if descriptors is None:
+            descriptors = self.expand_descriptors(self.data_descriptors)
+        bit_offsets = [message_bitmap.cursor]
         for subset_number in range(self.number_of_subsets):
+            for descriptor in descriptors:
+                descriptor.skip_value(message_bitmap)
+            bit_offsets.append(message_bitmap.cursor)
+        return bit_offsets
+
+    def extract_subsets(self, subset_numbers, bit_offsets=None):
+        if self.compressed:
+            raise ValueError('Subsets cannot be extracted from a compressed message')
+        if bit_offsets is None:
+            bit_offsets = self.subset_bit_offsets()
+        section_3 = self.__read__(self.__section_start__[3], self.__section_start__[4] - self.__section_start__[3])
+        section_4 = copy_bits(self.__read__(self.__section_start__[4] + 4, self.__section_start__[5] - self.__section_start__[4]),
+                              [(bit_offsets[i], bit_offsets[i + 1]) for i in subset_numbers])
+        return encode_message(self.bufr_edition, self.__read__(self.__section_start__[1], self.__section_start__[3] - self.__section_start__[1]),
+                              section_3[:4] + len(subset_numbers).to_bytes(2, 'big') + section_3[6:], encode_section(b'\x00' + section_4))
+
+    def read_subsets(self, descriptors=None, predicates=None, subset_offsets=None, events='all'):
+        if descriptors is None:
+            with stage(self.stats, 'expand'):
+                descriptors = self.expand_descriptors(self.data_descriptors, events)
+        with stage(self.stats, 'decode'):
+            subsets_collection = self.__decode_subsets__(descriptors, predicates, subset_offsets)
+        if self.stats is not None:
+            self.stats.count_subsets(subsets_collection)
+        return subsets_collection
+
+    def __decode_subsets__(self, descriptors, predicates, subset_offsets):
+        message_bitmap = self.section_4_data_bytes
+        if subset_offsets is None:
+            subset_offsets = [(subset_number, None) for subset_number in range(self.number_of_subsets)]
+
+        subsets_collection = SubsetCollection()
+
+        if self.compressed:
+            subsets, records = self.__read_compressed__(descriptors, predicates)
+            for subset_number, bit_offset in subset_offsets:
+                if predicates and not match_record(predicates, records[subset_number]):
+                    continue
+                subsets[subset_number].metadata['subset_number'] = subset_number
+                subsets_collection.append(subsets[subset_number])
+            return subsets_collection
+
+        bits_read = 0
+        for subset_number, bit_offset in subset_offsets:
+            if bit_offset is not None:
+                message_bitmap.seek(bit_offset)
+            subset_start = message_bitmap.cursor
+            if predicates:
+                if not self.__match_subset__(descriptors, message_bitmap, predicates):
+                    continue
+                message_bitmap.seek(subset_start)
             subset = BUFRSubset(self.__table_f__)
             subset.metadata['subset_number'] = subset_number
             for i in range(len(descriptors)):
                 value = descriptors[i].read_value(message_bitmap)
-                subset.append(value)
+                if value.__class__ == EventSequence:
+                    for event_value in value:
+                        subset.append(event_value)
+                else:
+                    subset.append(value)
+            bits_read += message_bitmap.cursor - subset_start
             subsets_collection.append(subset)
+        count(self.stats, 'bits_read', bits_read)
         return subsets_collection
 
-    def __str__(self):
-        description = [
+    def __describe__(self):
+        return [
             {
                 'Length of Section 0 (bytes)': lambda : '8',
                 'Total Length of BUFR Message (bytes)': lambda : str(self.__section_start__[6]),
@@ -560,20 +895,45 @@ class BUFRMessage(object):
                                                   ('\n\n' + '\n'.join([repr(x) for x in self.expand_descriptors(self.data_descriptors)])))
             },
             {
-                'Length of Section 4 (bytes)': lambda : str(self.__section_start__[5] - self.__section_start__[4]),
-                '': lambda :  '\n{0:=^50s}\n'.format(' Begin Section 4 Data ') + '\n'.join(wrap(str(self.section_4_data_bytes), width=51)) + '\n' + '{0:=^50s}\n'.format(' End Section 4 Data ')
+                'Length of Section 4 (bytes)': lambda : str(self.__section_start__[5] - self.__section_start__[4])
             }
         ]
 
+    def __write_section_4__(self, out_file, hex_bytes=None, chunk_size=17 * 4096):
+        if self.__fobj__.closed:
+            raise ClosedBUFRFile('File already closed.')
+        length = self.__section_start__[5] - self.__section_start__[4]
+        shown = length if hex_bytes is None else max(0, min(length, hex_bytes))
+        out_file.write('{0:<36s}\n{1:=^50s}\n'.format('', ' Begin Section 4 Data '))
+        for offset in range(0, shown, chunk_size):
+            for line in hex_lines(self.__read__(self.__section_start__[4] + 4 + offset, min(chunk_size, shown - offset)), 17):
+                out_file.write(line + '\n')
+        if shown < length:
+            out_file.write('... {0:d} more bytes\n'.format(length - shown))
+        out_file.write('{0:=^50s}\n\n'.format(' End Section 4 Data '))
 
+    def __write_values__(self, out_file, events='all'):
+        out_file.write('\n{0:^50s}\n\n'.format('Decoded Values'))
+        for subset_number, subset in enumerate(self.read_subsets(events=events).__list_iter__()):
+            out_file.write('Subset {0:d}\n'.format(subset_number))
+            for value in subset:
+                out_file.write('  {0!r}\n'.format(value))
 
-        output = ''
-
+    def write_dump(self, out_file, hex_bytes=None, values=False, events='all'):
+        description = self.__describe__()
         for section in range(len(description)):
-            output += '\n{0:^50s}\n\n'.format('BUFR Section {0:1d}'.format(section))
+            out_file.write('\n{0:^50s}\n\n'.format('BUFR Section {0:1d}'.format(section)))
             for label, property_name in description[section].items():
                 if type(property_name) == str:
-                    output += '{0:<36s}{1:>14s}\n'.format(label, str(getattr(self, property_name)))
+                    out_file.write('{0:<36s}{1:>14s}\n'.format(label, str(getattr(self, property_name))))
                 else:
-                    output += '{0:<36s}{1:>14s}\n'.format(label, property_name())
-        return output
\ No newline at end of file
+                    out_file.write('{0:<36s}{1:>14s}\n'.format(label, property_name()))
+        if hex_bytes != 0:
+            self.__write_section_4__(out_file, hex_bytes)
+        if values:
+            self.__write_values__(out_file, events)
+
+    def __str__(self):
+        output = StringIO()
+        self.write_dump(output)
+        return output.getvalue()
@@ -0,0 +1,91 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+from json import dump
+from os.path import join
+from platform import platform, python_version
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from .. import BUFRFile, MessageCollection, message_metadata
+from ..external import backend, numpy_found
+from ..memory import memory_report
+from ..utility.io.writer import write_csv
+from . import synthetic
+
+Dataset = namedtuple('Dataset', ('name', 'generator', 'arguments', 'events'))
+
+datasets = (
+    Dataset('prepbufr', synthetic.prepbufr_messages, {}, 'latest'),
+    Dataset('prepbufr_history', synthetic.prepbufr_messages, {}, 'history'),
+    Dataset('prepbufr_compressed', synthetic.prepbufr_messages, {'compressed': True}, 'latest'),
+    Dataset('sounding_309052', synthetic.sounding_messages, {}, 'all'),
+    Dataset('sounding_309052_compressed', synthetic.sounding_messages, {'compressed': True}, 'all'),
+)
+
+stage_names = ('scan', 'header', 'tables', 'expand', 'decode', 'rows', 'export')
+
+def assemble_rows(messages, subsets):
+    collection = MessageCollection()
+    for message_number, (message, message_subsets) in enumerate(zip(messages, subsets)):
+        message_subsets.metadata.update(message_metadata(message_number, message))
+        collection.append(message_subsets)
+    return collection.to_dict()
+
+def time_stages(filename, events, work_dir):
+    seconds = {}
+    def timed(stage, function):
+        start_time = perf_counter()
+        result = function()
+        seconds[stage] = perf_counter() - start_time
+        return result
+    with timed('scan', lambda: BUFRFile(filename, table_source=synthetic.table_source(), events=events)) as bufr_file:
+        timed('header', lambda: [(message.header, message.data_descriptors) for message in bufr_file.messages])
+        timed('tables', lambda: [message.__resolve_tables__() for message in bufr_file.messages])
+        descriptors = timed('expand', lambda: [message.expand_descriptors(message.data_descriptors, events) for message in bufr_file.messages])
+        subsets = timed('decode', lambda: [message.read_subsets(descriptors=x, events=events) for message, x in zip(bufr_file.messages, descriptors)])
+        rows = timed('rows', lambda: assemble_rows(bufr_file.messages, subsets))
+        timed('export', lambda: write_csv(rows, join(work_dir, 'rows.csv')))
+        counts = {'messages': len(bufr_file.messages), 'subsets': sum([x.__list_len__() for x in subsets]), 'rows': len(rows)}
+    return seconds, counts
+
+def run_dataset(dataset, work_dir, scale=1, repeat=3, memory=False):
+    arguments = dict(dataset.arguments)
+    arguments['messages'] = max(1, int(round(4 * scale)))
+    filename = join(work_dir, dataset.name + '.bufr')
+    file_bytes = synthetic.write_messages(filename, dataset.generator(**arguments))
+    runs = []
+    for i in range(repeat):
+        seconds, counts = time_stages(filename, dataset.events, work_dir)
+        runs.append(seconds)
+    result = {'bytes': file_bytes, 'events': dataset.events}
+    result.update(counts)
+    result['stages'] = dict([(stage, {'best': min([x[stage] for x in runs]), 'median': median([x[stage] for x in runs]), 'runs': [x[stage] for x in runs]})
+                             for stage in stage_names])
+    result['total'] = sum([x['best'] for x in result['stages'].values()])
+    if memory:
+        report = memory_report(filename, table_source=synthetic.table_source(), events=dataset.events)
+        result['memory'] = dict([(key, report[key]) for key in ('bytes', 'bytes_per_subset', 'bytes_per_value', 'row_bytes', 'classes', 'stages', 'peak_rss')])
+    return result
+
+def run_benchmarks(names=None, scale=1, repeat=3, label=None, memory=False):
+    results = {
+        'label': label,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': python_version(),
+        'platform': platform(),
+        'numpy': numpy_found,
+        'backend': backend,
+        'scale': scale,
+        'repeat': repeat,
+        'datasets': {}
+    }
+    with TemporaryDirectory() as work_dir:
+        for dataset in datasets:
+            if names is None or dataset.name in names:
+                results['datasets'][dataset.name] = run_dataset(dataset, work_dir, scale=scale, repeat=repeat, memory=memory)
+    return results
+
+def write_results(results, filename):
+    with open(filename, 'w') as out_file:
+        dump(results, out_file, indent=1)
@@ -0,0 +1,50 @@
+from os.path import abspath, dirname, exists, join
+from statistics import median
+from subprocess import DEVNULL, PIPE, run
+from sys import executable
+from time import perf_counter
+
+optional_modules = ('metpy', 'pint', 'pandas', 'numpy')
+
+script_dir = dirname(dirname(dirname(abspath(__file__))))
+
+commands = (
+    ('python', ['-c', 'pass']),
+    ('import', ['-c', 'import PyrepBUFR']),
+    ('batch_worker', ['-c', 'from PyrepBUFR.utility.io.batch import convert_file']),
+    ('spc_worker', ['-c', 'from PyrepBUFR.utility.io.spc import export_file']),
+    ('dump.py', [join(script_dir, 'dump.py'), '--help']),
+    ('batch_convert.py', [join(script_dir, 'batch_convert.py'), '--help']),
+    ('spc_export.py', [join(script_dir, 'spc_export.py'), '--help']),
+    ('lookup_element.py', [join(script_dir, 'lookup_element.py'), '--help']),
+)
+
+def loaded_modules(statement='import PyrepBUFR'):
+    output = run([executable, '-c', '{0:s}; import sys; print(\' \'.join(sorted(set([x.split(\'.\')[0] for x in sys.modules]))))'.format(statement)],
+                 cwd=script_dir, stdout=PIPE, stderr=DEVNULL, universal_newlines=True)
+    modules = output.stdout.split()
+    return dict([(name, name in modules) for name in optional_modules])
+
+def import_times(statement='import PyrepBUFR', top=10):
+    output = run([executable, '-X', 'importtime', '-c', statement], cwd=script_dir, stdout=DEVNULL, stderr=PIPE, universal_newlines=True)
+    times = []
+    for line in output.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times.append((fields[2].rstrip(), int(fields[1]) / 1e6))
+    return sorted(times, key=lambda x: -x[1])[:top]
+
+def time_command(arguments, repeat=5):
+    seconds = []
+    for i in range(repeat):
+        start_time = perf_counter()
+        run([executable] + arguments, cwd=script_dir, stdout=DEVNULL, stderr=DEVNULL)
+        seconds.append(perf_counter() - start_time)
+    return {'best': min(seconds), 'median': median(seconds), 'runs': seconds}
+
+def cold_start(repeat=5, top=10):
+    results = {'modules': loaded_modules(), 'imports': import_times(top=top), 'commands': {}}
+    for name, arguments in commands:
+        if arguments[0].startswith('-') or exists(arguments[0]):
+            results['commands'][name] = time_command(arguments, repeat=repeat)
+    return results
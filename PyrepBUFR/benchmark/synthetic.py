@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from random import Random
+
+from .. import BUFRFile, BUFRMessage
+from ..encoder import BUFREncoder
+from ..tables import TableCollection
+from ..tables.default import default_table
+
+dx_table_descriptors = ((1, 3, 0), (0, 31, 1), (0, 0, 1), (0, 0, 2), (0, 0, 3),
+                        (1, 1, 0), (0, 31, 1), (3, 0, 4),
+                        (1, 5, 0), (0, 31, 1), (3, 0, 3), (2, 5, 64), (1, 1, 0), (0, 31, 1), (0, 0, 30))
+
+prepbufr_data_types = (
+    ('002', 'ADPUPA', 'UPPER-AIR (RAOB, PIBAL, RECCO, DROPS) REPORTS'),
+)
+
+prepbufr_elements = (
+    ((0, 1, 194), 0, 0, 64, 'CCITT IA5', 'SID', 'STATION IDENTIFICATION'),
+    ((0, 6, 240), 2, -18000, 16, 'DEG E', 'XOB', 'LONGITUDE'),
+    ((0, 5, 240), 2, -9000, 15, 'DEG N', 'YOB', 'LATITUDE'),
+    ((0, 4, 215), 5, -2400000, 23, 'HOURS', 'DHR', 'OBSERVATION TIME MINUS CYCLE TIME'),
+    ((0, 55, 7), 0, 0, 9, 'CODE TABLE', 'TYP', 'PREPBUFR REPORT TYPE'),
+    ((0, 1, 193), 0, 0, 6, 'CODE TABLE', 'CAT', 'PREPBUFR DATA LEVEL CATEGORY'),
+    ((0, 7, 245), 1, 0, 14, 'MB', 'POB', 'PRESSURE OBSERVATION'),
+    ((0, 7, 246), 0, 0, 5, 'CODE TABLE', 'PQM', 'PRESSURE (QUALITY) MARKER'),
+    ((0, 7, 247), 0, 0, 5, 'CODE TABLE', 'PPC', 'PRESSURE EVENT PROGRAM CODE'),
+    ((0, 7, 248), 0, 0, 8, 'CODE TABLE', 'PRC', 'PRESSURE EVENT REASON CODE'),
+    ((0, 12, 245), 1, -2732, 14, 'DEG C', 'TOB', 'TEMPERATURE OBSERVATION'),
+    ((0, 12, 246), 0, 0, 5, 'CODE TABLE', 'TQM', 'TEMPERATURE (QUALITY) MARKER'),
+    ((0, 12, 247), 0, 0, 5, 'CODE TABLE', 'TPC', 'TEMPERATURE EVENT PROGRAM CODE'),
+    ((0, 12, 248), 0, 0, 8, 'CODE TABLE', 'TRC', 'TEMPERATURE EVENT REASON CODE'),
+)
+
+prepbufr_sequences = (
+    ((3, 60, 1), 'DRP16BIT', 'DELAYED REPLICATION (16 BIT COUNT)', ('101000', '031002')),
+    ((3, 60, 3), 'DRPSTAK', 'DELAYED REPLICATION (EVENT STACK)', ('101000', '031001')),
+    ((3, 61, 1), 'HEADR', 'REPORT HEADER SEQUENCE', ('001194', '006240', '005240', '004215', '055007')),
+    ((3, 61, 2), 'PRSLEVEL', 'PRESSURE LEVEL SEQUENCE', ('001193', '360003', '361003', '360003', '361004')),
+    ((3, 61, 3), 'P___EVENT', 'PRESSURE EVENT SEQUENCE', ('007245', '007246', '007247', '007248')),
+    ((3, 61, 4), 'T___EVENT', 'TEMPERATURE EVENT SEQUENCE', ('012245', '012246', '012247', '012248')),
+    ((3, 61, 5), 'ADPUPA', 'UPPER-AIR REPORTS', ('361001', '360001', '361002')),
+)
+
+def table_source():
+    return TableCollection(list(default_table.items()))
+
+def table_columns(data_types=prepbufr_data_types, elements=prepbufr_elements, sequences=prepbufr_sequences):
+    return {
+        'TABLAE': [[x[0] for x in data_types]],
+        'TABLAD1': [['{0:<8s} {1:s}'.format(x[1], x[2])[:32] for x in data_types]],
+        'TABLAD2': [['{0:<8s} {1:s}'.format(x[1], x[2])[32:] for x in data_types]],
+        'FDESC': [['{0:d}'.format(x[0][0]) for x in elements]],
+        'XDESC': [['{0:02d}'.format(x[0][1]) for x in elements]],
+        'YDESC': [['{0:03d}'.format(x[0][2]) for x in elements]],
+        'ELEMNA1': [['{0:<8s} {1:s}'.format(x[5], x[6])[:32] for x in elements]],
+        'ELEMNA2': [['{0:<8s} {1:s}'.format(x[5], x[6])[32:] for x in elements]],
+        'UNITSNA': [[x[4] for x in elements]],
+        'SCALESG': [['-' if x[1] < 0 else '+' for x in elements]],
+        'SCALEU': [['{0:3d}'.format(abs(x[1])) for x in elements]],
+        'REFERSG': [['-' if x[2] < 0 else '+' for x in elements]],
+        'REFERVA': [['{0:10d}'.format(abs(x[2])) for x in elements]],
+        'ELEMDWD': [['{0:3d}'.format(x[3]) for x in elements]],
+        'FDESC#2': [['{0:d}'.format(x[0][0]) for x in sequences]],
+        'XDESC#2': [['{0:02d}'.format(x[0][1]) for x in sequences]],
+        'YDESC#2': [['{0:03d}'.format(x[0][2]) for x in sequences]],
+        'OPER5': [['{0:<8s} {1:s}'.format(x[1], x[2]) for x in sequences]],
+        'DDSEQ': [[list(x[3]) for x in sequences]],
+    }
+
+def table_message(date):
+    return BUFREncoder(dx_table_descriptors, data_category=11).encode(table_columns(), date)
+
+def prepbufr_columns(random, subsets, levels, events, compressed=False, missing_fraction=0.05):
+    columns = dict([(key, []) for key in ('SID', 'XOB', 'YOB', 'DHR', 'TYP', 'CAT', 'POB', 'PQM', 'PPC', 'PRC', 'TOB', 'TQM', 'TPC', 'TRC')])
+    def maybe(value):
+        return None if random.random() < missing_fraction else value
+    for subset in range(subsets):
+        columns['SID'].append('{0:05d}'.format(72000 + random.randrange(1000)))
+        columns['XOB'].append(round(random.uniform(-179.0, 179.0), 2))
+        columns['YOB'].append(round(random.uniform(-80.0, 80.0), 2))
+        columns['DHR'].append(round(random.uniform(-3.0, 3.0), 5))
+        columns['TYP'].append(random.choice((120, 132, 220, 232)))
+        for key in ('CAT', 'POB', 'PQM', 'PPC', 'PRC', 'TOB', 'TQM', 'TPC', 'TRC'):
+            columns[key].append([])
+        for level in range(levels):
+            columns['CAT'][-1].append(1 if level > 0 else 0)
+            pressure = 1000.0 - 950.0 * level / max(levels - 1, 1)
+            temperature = 25.0 - 0.09 * (1000.0 - pressure)
+            count = events if compressed else random.randint(1, events)
+            for key in ('POB', 'PQM', 'PPC', 'PRC', 'TOB', 'TQM', 'TPC', 'TRC'):
+                columns[key][-1].append([])
+            for event in range(count):
+                columns['POB'][-1][-1].append(maybe(round(pressure - 0.3 * event, 1)))
+                columns['TOB'][-1][-1].append(maybe(round(temperature + 0.1 * event, 1)))
+                for key, value in (('PQM', 2), ('TQM', 2), ('PPC', 1 + event), ('TPC', 1 + event), ('PRC', 10 * event), ('TRC', 10 * event)):
+                    columns[key][-1][-1].append(maybe(value if event == 0 or key[1:] != 'QM' else 1))
+    return columns
+
+def load_tables(tables, table_bytes):
+    BUFRFile.process_prepbufr_table(tables, BUFRMessage(BytesIO(table_bytes), table_source=tables))
+    return tables
+
+def prepbufr_messages(messages=4, subsets=50, levels=20, events=3, compressed=False, seed=0):
+    random = Random(seed)
+    date = datetime(2024, 5, 3, 12)
+    output = [table_message(date)]
+    encoder = BUFREncoder('ADPUPA', table_source=load_tables(table_source(), output[0]), data_category=2)
+    for message in range(messages):
+        output.append(encoder.encode(prepbufr_columns(random, subsets, levels, events, compressed=compressed), date, compressed=compressed))
+    return output
+
+def sounding_columns(random, subsets, levels, date, missing_fraction=0.02):
+    columns = dict([(key, []) for key in ('WMOB', 'WMOS', 'SMID', 'YEAR', 'MNTH', 'DAYS', 'HOUR', 'MINU', 'SECO', 'CLATH', 'CLONH', 'HSMSL',
+                                          'LTDS', 'VSIGX', 'PRLC', 'GPH10', 'LATDH', 'LONDH', 'TMDB', 'TMDP', 'WDIR', 'WSPD')])
+    def maybe(value):
+        return None if random.random() < missing_fraction else value
+    for subset in range(subsets):
+        for key, value in (('WMOB', 72), ('WMOS', random.randrange(1000)), ('SMID', '{0:05d}'.format(subset)), ('YEAR', date.year),
+                           ('MNTH', date.month), ('DAYS', date.day), ('HOUR', date.hour), ('MINU', 0), ('SECO', 0),
+                           ('CLATH', round(random.uniform(-60.0, 60.0), 5)), ('CLONH', round(random.uniform(-170.0, 170.0), 5)),
+                           ('HSMSL', round(random.uniform(0.0, 1500.0), 1))):
+            columns[key].append(value)
+        fractions = [level / max(levels - 1, 1) for level in range(levels)]
+        for key, values in (('LTDS', [10 * level for level in range(levels)]),
+                            ('VSIGX', [65536 if level == 0 else 0 for level in range(levels)]),
+                            ('PRLC', [round(100000.0 - 90000.0 * x, -1) for x in fractions]),
+                            ('GPH10', [round(100.0 + 16000.0 * x) for x in fractions]),
+                            ('LATDH', [round(0.001 * level, 5) for level in range(levels)]),
+                            ('LONDH', [round(0.001 * level, 5) for level in range(levels)]),
+                            ('TMDB', [round(300.0 - 80.0 * x + random.uniform(-1.0, 1.0), 2) for x in fractions]),
+                            ('TMDP', [round(290.0 - 90.0 * x + random.uniform(-1.0, 1.0), 2) for x in fractions]),
+                            ('WDIR', [(7 * level) % 360 for level in range(levels)]),
+                            ('WSPD', [round(5.0 + random.uniform(0.0, 40.0), 1) for level in range(levels)])):
+            columns[key].append([value if key in ('LTDS', 'PRLC') else maybe(value) for value in values])
+    return columns
+
+def sounding_messages(messages=4, subsets=10, levels=100, compressed=False, seed=0):
+    random = Random(seed)
+    date = datetime(2024, 5, 3, 12)
+    encoder = BUFREncoder((3, 9, 52), data_category=2)
+    return [encoder.encode(sounding_columns(random, subsets, levels, date + timedelta(hours=6 * message)), date + timedelta(hours=6 * message),
+                           compressed=compressed)
+            for message in range(messages)]
+
+def write_messages(filename, messages):
+    with open(filename, 'wb') as out_file:
+        for message in messages:
+            out_file.write(message)
+    return sum([len(message) for message in messages])
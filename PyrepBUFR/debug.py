@@ -2,6 +2,11 @@ from textwrap import wrap
 
 def dump_bin(byte_string, bytes_per_line):
     return '\n'.join(wrap(' '.join(['{0:08b}'.format(x) for x in byte_string]), 9*bytes_per_line))
-    
+
+def hex_lines(byte_string, bytes_per_line):
+    bytes_per_line = max(1, int(min(bytes_per_line, len(byte_string))))
+    for offset in range(0, len(byte_string), bytes_per_line):
+        yield ' '.join(['{0:02X}'.format(x) for x in byte_string[offset:offset + bytes_per_line]])
+
 def dump_hex(byte_string, bytes_per_line):
-    return '\n'.join(wrap(' '.join(['{0:02X}'.format(x) for x in byte_string]), 3*bytes_per_line))
+    return '\n'.join(hex_lines(byte_string, bytes_per_line))
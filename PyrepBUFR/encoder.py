@@ -0,0 +1,340 @@
+from datetime import datetime
+
+from . import DescriptorTables
+from .external import arange, argsort, array, concatenate, cumsum, float64, frexp, frombuffer, int64, isfinite, numpy_found, ones, pack_bits, repeat, rint, uint8, uint64, where, zeros
+from .replication import Replication, DelayedReplication
+from .tables.default import default_table
+from .utility import encode_message, encode_section
+from .values import BUFRLookupTable, BUFRSequence, BUFRValue, ReplicationGroup
+
+value_field = -1
+count_field = -2
+
+def descriptor_keys(descriptors, occurrences=None):
+    occurrences = {} if occurrences is None else occurrences
+    keys = []
+    for descriptor in descriptors:
+        if issubclass(descriptor.__class__, Replication):
+            keys.append(descriptor_keys(descriptor.data_elements, occurrences))
+        else:
+            occurrences[descriptor.mnemonic] = occurrences.get(descriptor.mnemonic, 0) + 1
+            keys.append(descriptor.mnemonic if occurrences[descriptor.mnemonic] == 1 else '{0:s}#{1:d}'.format(descriptor.mnemonic, occurrences[descriptor.mnemonic]))
+    return keys
+
+def flatten_keys(keys):
+    return [x for key in keys for x in (flatten_keys(key) if type(key) == list else [key])]
+
+def is_missing_value(value):
+    return value is None or (type(value) == float and value != value)
+
+def encode_element(element, values, count):
+    bit_width = int(element.bit_width)
+    missing_value = (1 << bit_width) - 1
+    values = [None] * count if values is None else values
+    if element.unit == 'CCITT IA5':
+        byte_width = bit_width // 8
+        strings = b''.join([b'\xff' * byte_width if is_missing_value(value) else str(value).encode('ascii')[:byte_width].ljust(byte_width, b' ')
+                            for value in values])
+        if numpy_found:
+            strings = frombuffer(strings, dtype=uint8).reshape(count, byte_width).astype(uint64)
+            return [strings[:, i] for i in range(byte_width)], [8] * byte_width
+        return [list(strings[i::byte_width]) for i in range(byte_width)], [8] * byte_width
+    if numpy_found:
+        values = array(values, dtype=float64).reshape(count)
+        valid = isfinite(values)
+        raw = rint(where(valid, values, 0.0) * 10.0 ** int(element.scale)) - int(element.reference_value)
+        return [where(valid & (raw >= 0) & (raw < missing_value), raw, missing_value).astype(uint64)], [bit_width]
+    output = []
+    for value in values:
+        raw = missing_value if is_missing_value(value) else int(round(value * 10.0 ** int(element.scale))) - int(element.reference_value)
+        output.append(raw if 0 <= raw < missing_value else missing_value)
+    return [output], [bit_width]
+
+def replication_counts(descriptor, keys, columns, count):
+    if not issubclass(descriptor.__class__, DelayedReplication):
+        return [int(descriptor.y)] * count
+    counts = [0] * count
+    for key in flatten_keys(keys):
+        if columns.get(key, None) is not None:
+            counts = [max(n, 0 if is_missing_value(values) else len(values)) for n, values in zip(counts, columns[key])]
+    return counts
+
+def replicated_columns(keys, columns, counts):
+    return dict([(key, [None if is_missing_value(values) or k >= len(values) else values[k] for values, n in zip(columns[key], counts) for k in range(n)])
+                 for key in flatten_keys(keys) if columns.get(key, None) is not None])
+
+def element_format(element):
+    bit_width = int(element.bit_width)
+    if element.unit == 'CCITT IA5':
+        return (True, bit_width, 1.0, 0, (1 << bit_width) - 1)
+    return (False, bit_width, 10.0 ** int(element.scale), int(element.reference_value), (1 << bit_width) - 1)
+
+def encoding_plan(descriptors, keys):
+    plan = []
+    for descriptor, key in zip(descriptors, keys):
+        if issubclass(descriptor.__class__, Replication):
+            plan.append((flatten_keys(key), element_format(descriptor.replication_element) if issubclass(descriptor.__class__, DelayedReplication) else None,
+                         int(descriptor.y), encoding_plan(descriptor.data_elements, key)))
+        else:
+            plan.append((key, element_format(descriptor)))
+    return plan
+
+def encode_value(value_format, value, values, bit_widths):
+    is_string, bit_width, scale, reference_value, missing_value = value_format
+    if is_string:
+        byte_width = bit_width // 8
+        raw = int.from_bytes(b'\xff' * byte_width if is_missing_value(value) else str(value).encode('ascii')[:byte_width].ljust(byte_width, b' '), 'big')
+    else:
+        raw = missing_value if is_missing_value(value) else int(round(value * scale)) - reference_value
+        raw = raw if 0 <= raw < missing_value else missing_value
+    values.append(raw)
+    bit_widths.append(bit_width)
+
+def subset_fields(plan, subset_values, values, bit_widths, kinds=None):
+    for step in plan:
+        if len(step) == 2:
+            encode_value(step[1], subset_values.get(step[0], None), values, bit_widths)
+            if kinds is not None:
+                kinds.append(0 if step[1][0] else value_field)
+            continue
+        keys, count_format, count, child_plan = step
+        columns = dict([(key, subset_values[key]) for key in keys if not is_missing_value(subset_values.get(key, None))])
+        if count_format is not None:
+            count = max([len(column) for column in columns.values()] + [0])
+            encode_value(count_format, count, values, bit_widths)
+            if kinds is not None:
+                kinds.append(count_field)
+        for k in range(count):
+            subset_fields(child_plan, dict([(key, column[k]) for key, column in columns.items() if k < len(column)]), values, bit_widths, kinds)
+
+def layout_fields(descriptors, keys, columns, count):
+    instances = arange(count)
+    position = zeros(count, dtype=int64)
+    fields = []
+    for descriptor, key in zip(descriptors, keys):
+        if issubclass(descriptor.__class__, Replication):
+            counts = array(replication_counts(descriptor, key, columns, count), dtype=int64)
+            if issubclass(descriptor.__class__, DelayedReplication):
+                values, bit_widths = encode_element(descriptor.replication_element, counts, count)
+                fields.append((values[0], bit_widths[0], instances, position, count_field))
+                position = position + 1
+            owner = repeat(instances, counts)
+            child_fields, child_sizes = layout_fields(descriptor.data_elements, key, replicated_columns(key, columns, counts), len(owner))
+            child_offsets = cumsum(child_sizes) - child_sizes
+            group_start = cumsum(counts) - counts
+            child_start = position[owner] + child_offsets - child_offsets[group_start[owner]]
+            fields.extend([(values, bit_width, owner[instance], child_start[instance] + child_position, kind)
+                           for values, bit_width, instance, child_position, kind in child_fields])
+            totals = concatenate((zeros(1, dtype=int64), cumsum(child_sizes)))
+            position = position + totals[group_start + counts] - totals[group_start]
+        else:
+            values, bit_widths = encode_element(descriptor, columns.get(key, None), count)
+            for i, (value_column, bit_width) in enumerate(zip(values, bit_widths)):
+                fields.append((value_column, bit_width, instances, position, i if descriptor.unit == 'CCITT IA5' else value_field))
+                position = position + 1
+    return fields, position
+
+def compress_layout(fields, sizes, count):
+    if (sizes != sizes[0]).any():
+        raise ValueError('Compressed messages require identical replication counts in every subset')
+    order = argsort(concatenate([position * count + instance for values, bit_width, instance, position, kind in fields]), kind='stable')
+    values = concatenate([values for values, bit_width, instance, position, kind in fields])[order].reshape(-1, count)
+    bit_widths = concatenate([zeros(len(values), dtype=int64) + bit_width for values, bit_width, instance, position, kind in fields])[order][::count]
+    kinds = concatenate([zeros(len(values), dtype=int64) + kind for values, bit_width, instance, position, kind in fields])[order][::count]
+    if (values[kinds == count_field] != values[kinds == count_field][:, :1]).any():
+        raise ValueError('Compressed messages require identical replication counts in every subset')
+    stride = count + 2
+    rows = arange(len(bit_widths))
+    numeric = rows[kinds < 0]
+    missing_value = (ones(len(numeric), dtype=uint64) << bit_widths[numeric].astype(uint64)) - 1
+    present = values[numeric] != missing_value[:, None]
+    reference = where(present, values[numeric], missing_value[:, None]).min(axis=1)
+    span = where(present, values[numeric] - reference[:, None], 0).max(axis=1)
+    span = span + ((span > 0) | (present.any(axis=1) & ~present.all(axis=1)))
+    increment_width = frexp(span.astype(float64))[1].astype(int64)
+    increments = where(present, values[numeric] - reference[:, None], (ones(len(numeric), dtype=uint64) << increment_width.astype(uint64))[:, None] - 1)
+    packed = increment_width > 0
+    output_keys = [numeric * stride, numeric * stride + 1, (numeric[packed] * stride)[:, None] + 2 + arange(count)]
+    output_values = [reference, increment_width.astype(uint64), increments[packed]]
+    output_widths = [bit_widths[numeric], zeros(len(numeric), dtype=int64) + 6, repeat(increment_width[packed], count)]
+    for first_row in rows[kinds == 0]:
+        last_row = first_row + 1
+        while last_row < len(kinds) and kinds[last_row] == last_row - first_row:
+            last_row += 1
+        strings = values[first_row:last_row]
+        byte_width = last_row - first_row
+        if (strings == strings[:, :1]).all():
+            output_keys.append(first_row * stride + arange(byte_width + 1))
+            output_values.append(concatenate((strings[:, 0], zeros(1, dtype=uint64))))
+        else:
+            output_keys.append(first_row * stride + arange(byte_width * (count + 1) + 1))
+            output_values.append(concatenate((zeros(byte_width, dtype=uint64), array([byte_width], dtype=uint64), strings.T.ravel())))
+        output_widths.append(zeros(len(output_keys[-1]), dtype=int64) + 8)
+        output_widths[-1][byte_width] = 6
+    order = argsort(concatenate([x.ravel() for x in output_keys]), kind='stable')
+    return pack_bits(concatenate([x.ravel() for x in output_values])[order], concatenate(output_widths)[order])
+
+def compress_values(subset_values, subset_widths, kinds, count):
+    if max([x != subset_widths[0] for x in subset_widths]):
+        raise ValueError('Compressed messages require identical replication counts in every subset')
+    values = []
+    bit_widths = []
+    for column, bit_width, kind in zip(zip(*subset_values), subset_widths[0], kinds):
+        if kind == count_field and min(column) != max(column):
+            raise ValueError('Compressed messages require identical replication counts in every subset')
+        if kind >= 0:
+            if min(column) == max(column):
+                values.extend((column[0], 0))
+                bit_widths.extend((bit_width, 6))
+            else:
+                values.extend((0, bit_width // 8) + column)
+                bit_widths.extend([bit_width, 6] + [bit_width] * count)
+            continue
+        missing_value = (1 << bit_width) - 1
+        present = [x for x in column if x != missing_value]
+        reference = min(present) if len(present) > 0 else missing_value
+        span = max(present) - reference if len(present) > 0 else 0
+        increment_width = (span + (span > 0 or 0 < len(present) < count)).bit_length()
+        values.extend((reference, increment_width))
+        bit_widths.extend((bit_width, 6))
+        if increment_width > 0:
+            values.extend([(1 << increment_width) - 1 if x == missing_value else x - reference for x in column])
+            bit_widths.extend([increment_width] * count)
+    return pack_bits(values, bit_widths)
+
+def encode_subsets(descriptors, keys, columns, count, compressed=False):
+    if numpy_found:
+        fields, sizes = layout_fields(descriptors, keys, columns, count)
+        if len(fields) == 0 or count == 0:
+            return b''
+        if compressed:
+            return compress_layout(fields, sizes, count)
+        stride = int(sizes.max()) + 1
+        order = argsort(concatenate([instance * stride + position for values, bit_width, instance, position, kind in fields]), kind='stable')
+        return pack_bits(concatenate([values for values, bit_width, instance, position, kind in fields])[order],
+                         concatenate([zeros(len(values), dtype=int64) + bit_width for values, bit_width, instance, position, kind in fields])[order])
+    plan = encoding_plan(descriptors, keys)
+    if compressed:
+        if count == 0:
+            return b''
+        subset_values = []
+        subset_widths = []
+        kinds = []
+        for i in range(count):
+            subset_values.append([])
+            subset_widths.append([])
+            subset_fields(plan, dict([(key, column[i]) for key, column in columns.items()]), subset_values[-1], subset_widths[-1], kinds if i == 0 else None)
+        return compress_values(subset_values, subset_widths, kinds, count)
+    values = []
+    bit_widths = []
+    for i in range(count):
+        subset_fields(plan, dict([(key, column[i]) for key, column in columns.items()]), values, bit_widths)
+    return pack_bits(values, bit_widths)
+
+def subset_count(columns):
+    return max([len(column) for column in columns.values()] + [0])
+
+def sequence_items(sequence, values, groups):
+    for item in sequence.__list_iter__():
+        if issubclass(item.__class__, ReplicationGroup):
+            groups.append(item)
+        elif issubclass(item.__class__, BUFRSequence):
+            sequence_items(item, values, groups)
+        elif issubclass(item.__class__, BUFRValue):
+            values.append(item)
+
+def sequence_values(descriptors, keys, sequence, output=None):
+    output = {} if output is None else output
+    values = []
+    groups = []
+    sequence_items(sequence, values, groups)
+    values = iter(values)
+    groups = iter(groups)
+    for descriptor, key in zip(descriptors, keys):
+        if issubclass(descriptor.__class__, Replication):
+            children = [sequence_values(descriptor.data_elements, key, child) for child in next(groups).groups[1:]]
+            for x in flatten_keys(key):
+                output[x] = [child.get(x, None) for child in children]
+        else:
+            value = next(values)
+            output[key] = None if value.is_missing else (value.data_raw if issubclass(value.__class__, BUFRLookupTable) else value.data)
+    return output
+
+def subset_columns(descriptors, keys, subsets):
+    records = [sequence_values(descriptors, keys, subset) for subset in subsets.__list_iter__()]
+    return dict([(key, [record.get(key, None) for record in records]) for key in flatten_keys(keys)])
+
+def encode_descriptors(descriptors):
+    return b''.join([((int(f) << 14) | (int(x) << 8) | int(y)).to_bytes(2, 'big') for f, x, y in descriptors])
+
+class BUFREncoder(DescriptorTables):
+    def __init__(self, descriptors, table_source=default_table, bufr_edition=4, bufr_master_table=0, originating_center=7,
+                 originating_subcenter=0, update_sequence_number=0, data_category=0, international_data_sub_category=0,
+                 local_sub_category=0, master_table_version=38, local_table_version=0, observed_data=True, tables=None):
+        self.__table_source__ = table_source
+        self.bufr_edition = bufr_edition
+        self.bufr_master_table = bufr_master_table
+        self.originating_center = originating_center
+        self.originating_subcenter = originating_subcenter
+        self.update_sequence_number = update_sequence_number
+        self.data_category = data_category
+        self.international_data_sub_category = international_data_sub_category
+        self.local_sub_category = local_sub_category
+        self.master_table_version = master_table_version
+        self.local_table_version = local_table_version
+        self.observed_data = observed_data
+        if tables is None:
+            self.__resolve_tables__()
+        else:
+            self.__table_a__, self.__table_b__, self.__table_d__, self.__table_f__ = tables
+        if type(descriptors) == str:
+            sequence = self.__table_d__.find(lambda id: self.__table_d__[id].mnemonic == descriptors)
+            if sequence.is_empty:
+                raise ValueError('Sequence \'{0:s}\' not found in Table D'.format(descriptors))
+            descriptors = [tuple(sequence.iloc(0).id)]
+        elif len(descriptors) == 3 and not hasattr(descriptors[0], '__len__'):
+            descriptors = [descriptors]
+        self.data_descriptors = [tuple([int(x) for x in descriptor]) for descriptor in descriptors]
+        self.descriptors = self.expand_descriptors([list(x) for x in self.data_descriptors])
+        self.keys = descriptor_keys(self.descriptors)
+
+    @staticmethod
+    def from_message(message, **kwargs):
+        header = dict([(key, getattr(message, key)) for key in ('bufr_edition', 'bufr_master_table', 'originating_center', 'originating_subcenter',
+                                                                 'update_sequence_number', 'data_category', 'local_sub_category',
+                                                                 'master_table_version', 'local_table_version', 'observed_data')])
+        header['international_data_sub_category'] = message.international_data_sub_category or 0
+        header.update(kwargs)
+        return BUFREncoder([tuple(x) for x in message.data_descriptors], tables=message.tables, **header)
+
+    def section_1(self, date):
+        date = datetime(*date) if type(date) in (tuple, list) else date
+        if self.bufr_edition == 3:
+            return encode_section(bytes([self.bufr_master_table, self.originating_subcenter, self.originating_center, self.update_sequence_number, 0,
+                                         self.data_category, self.local_sub_category, self.master_table_version, self.local_table_version,
+                                         date.year % 100, date.month, date.day, date.hour, date.minute, 0]))
+        return encode_section(bytes([self.bufr_master_table]) + int(self.originating_center).to_bytes(2, 'big') + int(self.originating_subcenter).to_bytes(2, 'big')
+                              + bytes([self.update_sequence_number, 0, self.data_category, self.international_data_sub_category, self.local_sub_category,
+                                       self.master_table_version, self.local_table_version])
+                              + int(date.year).to_bytes(2, 'big') + bytes([date.month, date.day, date.hour, date.minute, date.second]), pad=False)
+
+    def section_3(self, number_of_subsets, compressed=False):
+        return encode_section(b'\x00' + int(number_of_subsets).to_bytes(2, 'big') + bytes([(128 if self.observed_data else 0) | (64 if compressed else 0)])
+                              + encode_descriptors(self.data_descriptors))
+
+    def columns(self, subsets):
+        return subset_columns(self.descriptors, self.keys, subsets)
+
+    def encode(self, columns, date, compressed=False):
+        number_of_subsets = subset_count(columns)
+        return encode_message(self.bufr_edition, self.section_1(date), self.section_3(number_of_subsets, compressed=compressed),
+                              encode_section(b'\x00' + encode_subsets(self.descriptors, self.keys, columns, number_of_subsets, compressed=compressed)))
+
+    def write(self, out_file, columns, date, subsets_per_message=None, compressed=False):
+        number_of_subsets = subset_count(columns)
+        subsets_per_message = max(number_of_subsets, 1) if subsets_per_message is None else subsets_per_message
+        message_count = 0
+        for first_subset in range(0, number_of_subsets, subsets_per_message):
+            out_file.write(self.encode(dict([(key, column[first_subset:first_subset + subsets_per_message]) for key, column in columns.items()]), date, compressed=compressed))
+            message_count += 1
+        return message_count
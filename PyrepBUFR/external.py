@@ -1,6 +1,15 @@
+from os import environ
+
+# Select the array backend, PYREPBUFR_BACKEND=python skips NumPy even when it is installed
+backend = environ.get('PYREPBUFR_BACKEND', 'numpy').strip().lower()
+if backend not in ('numpy', 'python'):
+    raise ValueError('PYREPBUFR_BACKEND must be \'numpy\' or \'python\', not \'{0:s}\''.format(backend))
+
 # Import Numpy functions and supply alternatives if not present
 try:
-    from numpy import arange, arctan2, array, ceil, diff, dtype, exp, float64, floor, frombuffer, hypot, isfinite, isnan, log, min_scalar_type, nan, ones, pi, uint8, zeros
+    if backend == 'python':
+        raise ModuleNotFoundError('NumPy backend disabled by PYREPBUFR_BACKEND')
+    from numpy import arange, arctan2, argsort, array, bincount, ceil, concatenate, cos, cumsum, diff, dtype, exp, float64, floor, frexp, frombuffer, hypot, inf, int64, isfinite, isnan, log, maximum, min_scalar_type, minimum, nan, ones, pi, repeat, rint, sin, uint8, uint64, where, zeros
 
     numpy_found = True
 
@@ -28,15 +37,44 @@ try:
     def fill_array(shape, value, dtype=uint8):
         return ones(shape) * value
 
+    def datetime_array(seconds):
+        return array([('NaT' if x is None else x) for x in seconds], dtype='datetime64[s]')
+
+    def pack_bits(values, bit_widths):
+        values = array(values, dtype=uint64)
+        bit_widths = array(bit_widths, dtype=uint64)
+        if len(values) == 0:
+            return b''
+        bit_offsets = cumsum(bit_widths) - bit_widths
+        byte_length = int((bit_offsets[-1] + bit_widths[-1] + 7) // 8)
+        words = (values << (uint64(64) - bit_offsets % uint64(8) - bit_widths)).astype('>u8').view(uint8)
+        byte_index = (bit_offsets // uint64(8)).astype(int64)[:, None] + arange(8)
+        return bincount(byte_index.ravel(), weights=words, minlength=byte_length + 8)[:byte_length].astype(uint8).tobytes()
+
+    def unpack_bits(byte_string, bit_offsets, bit_widths):
+        byte_array = frombuffer(bytes(byte_string) + b'\x00' * 8, dtype=uint8)
+        bit_offsets = array(bit_offsets, dtype=uint64)
+        bit_widths = array(bit_widths, dtype=uint64)
+        words = byte_array[(bit_offsets // uint64(8)).astype(int64)[:, None] + arange(8)].view('>u8').ravel().astype(uint64)
+        return (words >> (uint64(64) - bit_offsets % uint64(8) - bit_widths)) & ((uint64(1) << bit_widths) - uint64(1))
+
 except ModuleNotFoundError:
-    from math import atan2 as arctan2, ceil, exp, floor, hypot, log, isfinite, isnan, pi
-    from re import sub
+    from array import array as typed_array
+    from datetime import datetime, timezone
+    from math import atan2 as arctan2, ceil, cos, exp, floor, frexp, hypot, inf, log, isfinite, isnan, pi, sin
+    from sys import byteorder
 
     numpy_found = False
+    backend = 'python'
+
+    typecodes = dict([((code.isupper(), typed_array(code).itemsize), code) for code in reversed('bBhHiIlLqQ')])
 
     arange = range
+    rint = round
     
     uint8 = int
+    uint64 = int
+    int64 = int
     float64 = float
     nan = float('nan')
     
@@ -44,29 +82,25 @@ except ModuleNotFoundError:
         return values
 
     def zeros(size, dtype=int):
-        if str(dtype).find('int') > -1:
-            dtype = int
-        else:
-            dtype = float
-        return [dtype(0) for i in range(size)]
+        return typed_array('q' if str(dtype).find('int') > -1 else 'd', bytes(8 * size))
 
     def ones(size, dtype=int):
         if str(dtype).find('int') > -1:
-            dtype = int
-        else:
-            dtype = float
-        return [dtype(1) for i in range(size)]
+            return typed_array('q', [1]) * size
+        return typed_array('d', [1.0]) * size
 
     class dtype(object):
         def __init__(self, spec):
             self.type = int
-    
+
     def frombuffer(byte_string, type_spec):
-         byte_order = 'big' if sub('[ui\d\s]', '', type_spec) == '>' else 'little'
-         byte_width = int(sub('[<>iu\s]', '', type_spec))
-         signed     = sub('[<>\d\s]', '', type_spec) == 'i'
-         return [int.from_bytes(byte_string[i:i+byte_width], byte_order, signed=signed) for i in range(0, len(byte_string), byte_width)]
-    
+        type_spec = type_spec.strip()
+        byte_width = int(type_spec.lstrip('<>=|')[1:])
+        values = typed_array(typecodes[(type_spec.lstrip('<>=|')[0] == 'u', byte_width)], byte_string[:len(byte_string) - len(byte_string) % byte_width])
+        if byte_width > 1 and ('big' if type_spec[0] == '>' else 'little') != byteorder:
+            values.byteswap()
+        return values
+
     class min_scalar_type(object):
         def __init__(self, value):
             self.type = type(value)
@@ -106,36 +140,89 @@ except ModuleNotFoundError:
     def fill_array(shape, value, dtype=None):
         return [value for i in range(shape)]
 
-# Import Pint functions and supply alternatives if not present
-try:
-    from metpy.units import units
-    Quantity = units.Quantity
-except:
-    try:
-        from pint import Quantity, UnitRegistry
+    def argsort(values):
+        return sorted(range(len(values)), key=values.__getitem__)
 
-        units = UnitRegistry()
-        units.define('percent = 1 / 100 = %')
+    def maximum(a, b):
+        return max(a, b)
 
-    except ImportError:
-        class UnitRegistry(object):
-            def __call__(self, *args, **kwargs):
-                raise ImportError("Could not find pint module.")
-            def __getattribute__(self, *args, **kwargs):
-                self()
-            def define(self, *args, **kwargs):
-                self()
-
-        class Quantity(object):
-            def __init__(self, *args, **kwargs):
-                raise ImportError("Could not find pint module.")
+    def minimum(a, b):
+        return min(a, b)
 
-        units = UnitRegistry()
+    def where(condition, a, b):
+        return a if condition else b
 
-# Import Pandas functions and supply alternatives if not present
-try:
-    from pandas import DataFrame
-except ImportError:
-    class DataFrame(object):
-        def __init__(self, *args, **kwargs):
-            raise ImportError("Could not find pandas module.")
\ No newline at end of file
+    def cumsum(values):
+        total = 0
+        output = []
+        for value in values:
+            total += value
+            output.append(total)
+        return output
+
+    def repeat(values, counts):
+        return [value for value, count in zip(values, counts) for i in range(count)]
+
+    def concatenate(arrays):
+        return [value for values in arrays for value in values]
+
+    def unpack_bits(byte_string, bit_offsets, bit_widths):
+        return [(int.from_bytes(byte_string[bit_offset // 8:(bit_offset + bit_width + 7) // 8], 'big') >> (-(bit_offset + bit_width) % 8)) & ((1 << bit_width) - 1)
+                for bit_offset, bit_width in zip(bit_offsets, bit_widths)]
+
+    def pack_bits(values, bit_widths):
+        bits = ''.join(['{0:0{1:d}b}'.format(int(value), int(bit_width)) for value, bit_width in zip(values, bit_widths)])
+        bits += '0' * (-len(bits) % 8)
+        return int(bits, 2).to_bytes(len(bits) // 8, 'big') if len(bits) > 0 else b''
+
+    def datetime_array(seconds):
+        return [(None if x is None else datetime.fromtimestamp(x, timezone.utc)) for x in seconds]
+
+# Import Pint and Pandas on first use and supply alternatives if not present
+def load_units():
+    try:
+        from metpy.units import units
+        Quantity = units.Quantity
+    except:
+        try:
+            from pint import Quantity, UnitRegistry
+
+            units = UnitRegistry()
+            units.define('percent = 1 / 100 = %')
+
+        except ImportError:
+            class UnitRegistry(object):
+                def __call__(self, *args, **kwargs):
+                    raise ImportError("Could not find pint module.")
+                def __getattribute__(self, *args, **kwargs):
+                    self()
+                def define(self, *args, **kwargs):
+                    self()
+
+            class Quantity(object):
+                def __init__(self, *args, **kwargs):
+                    raise ImportError("Could not find pint module.")
+
+            units = UnitRegistry()
+    return {'units': units, 'Quantity': Quantity}
+
+def load_pandas():
+    try:
+        from pandas import DataFrame
+    except ImportError:
+        class DataFrame(object):
+            def __init__(self, *args, **kwargs):
+                raise ImportError("Could not find pandas module.")
+    return {'DataFrame': DataFrame}
+
+lazy_imports = {
+    'units': load_units,
+    'Quantity': load_units,
+    'DataFrame': load_pandas
+}
+
+def __getattr__(name):
+    if name not in lazy_imports:
+        raise AttributeError('module \'{0:s}\' has no attribute \'{1:s}\''.format(__name__, name))
+    globals().update(lazy_imports[name]())
+    return globals()[name]
@@ -0,0 +1,216 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from json import dump, load
+from math import asin, cos, degrees, floor, radians, sin, sqrt
+from os import stat
+
+from .external import datetime_array
+
+location_keys = (('CLATH', 'CLONH'), ('CLAT', 'CLON'), ('YOB', 'XOB'))
+
+station_keys = ('SID', 'RPID', 'SMID', 'WMOB', 'WMOS')
+
+time_keys = ('YEAR', 'MNTH', 'DAYS', 'HOUR', 'MINU', 'SECO', 'DHR')
+
+earth_radius = 6371.0
+
+def normalize_longitude(longitude):
+    return ((longitude + 180.0) % 360.0) - 180.0
+
+def great_circle_distance(latitude_0, longitude_0, latitude_1, longitude_1):
+    latitude_0, longitude_0, latitude_1, longitude_1 = [radians(x) for x in (latitude_0, longitude_0, latitude_1, longitude_1)]
+    a = sin((latitude_1 - latitude_0) / 2) ** 2 + cos(latitude_0) * cos(latitude_1) * sin((longitude_1 - longitude_0) / 2) ** 2
+    return 2 * earth_radius * asin(min(1.0, sqrt(a)))
+
+def subset_location(values):
+    for latitude_key, longitude_key in location_keys:
+        if values.get(latitude_key, None) is not None and values.get(longitude_key, None) is not None:
+            return (float(values[latitude_key]), normalize_longitude(float(values[longitude_key])))
+    return (None, None)
+
+def subset_station(values):
+    for key in station_keys[:3]:
+        if values.get(key, None) is not None and str(values[key]).strip() != '':
+            return str(values[key]).strip()
+    if values.get('WMOB', None) is not None and values.get('WMOS', None) is not None:
+        return '{0:02d}{1:03d}'.format(int(values['WMOB']), int(values['WMOS']))
+    return None
+
+def epoch_seconds(value):
+    if value is None:
+        return None
+    if hasattr(value, 'astype'):
+        value = value.astype('datetime64[s]').astype(object)
+    if type(value) == str:
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(round(value.timestamp()))
+
+def message_cycle_time(message):
+    return epoch_seconds(datetime(message.file_year, message.file_month, message.file_day,
+                                  message.file_hour, message.file_minute, message.file_second))
+
+def subset_time(values, cycle_time=None):
+    if min([values.get(key, None) is not None for key in time_keys[:4]]):
+        try:
+            return epoch_seconds(datetime(*[int(values[key]) for key in time_keys[:4]],
+                                          *[int(values.get(key, None) or 0) for key in time_keys[4:6]]))
+        except ValueError:
+            return None
+    if values.get('DHR', None) is not None and cycle_time is not None:
+        return cycle_time + int(round(float(values['DHR']) * 3600.0))
+    return None
+
+def file_identity(filename):
+    if type(filename) != str:
+        return (None, None)
+    file_stat = stat(filename)
+    return (file_stat.st_size, file_stat.st_mtime_ns)
+
+class SpatialIndex(object):
+    __slots__ = ('cell_size', 'cells', 'latitude', 'longitude')
+    def __init__(self, latitude, longitude, cell_size=1.0):
+        self.cell_size = cell_size
+        self.latitude = latitude
+        self.longitude = longitude
+        self.cells = {}
+        for position, location in enumerate(zip(latitude, longitude)):
+            if location[0] is not None:
+                self.cells.setdefault(self.cell(*location), []).append(position)
+    def cell(self, latitude, longitude):
+        return (int(floor((latitude + 90.0) / self.cell_size)), int(floor((normalize_longitude(longitude) + 180.0) / self.cell_size)))
+    def __candidates__(self, latitude_range, longitude_ranges):
+        lat_cell_0 = self.cell(max(latitude_range[0], -90.0), 0)[0]
+        lat_cell_1 = self.cell(min(latitude_range[1], 90.0), 0)[0]
+        positions = []
+        for longitude_range in longitude_ranges:
+            lon_cell_0 = self.cell(0, longitude_range[0])[1]
+            lon_cell_1 = self.cell(0, min(longitude_range[1], 180.0 - 1e-9))[1]
+            for i in range(lat_cell_0, lat_cell_1 + 1):
+                for j in range(lon_cell_0, lon_cell_1 + 1):
+                    positions.extend(self.cells.get((i, j), []))
+        return sorted(set(positions))
+    def within(self, latitude_range, longitude_range):
+        longitude_0, longitude_1 = [normalize_longitude(x) for x in longitude_range]
+        if longitude_range[1] - longitude_range[0] >= 360.0:
+            longitude_ranges = [(-180.0, 180.0)]
+        elif longitude_0 <= longitude_1:
+            longitude_ranges = [(longitude_0, longitude_1)]
+        else:
+            longitude_ranges = [(longitude_0, 180.0), (-180.0, longitude_1)]
+        return [position for position in self.__candidates__(latitude_range, longitude_ranges)
+                if latitude_range[0] <= self.latitude[position] <= latitude_range[1]
+                and max([x[0] <= self.longitude[position] <= x[1] for x in longitude_ranges])]
+    def near(self, latitude, longitude, radius):
+        latitude_delta = degrees(radius / earth_radius)
+        longitude_range = (-180.0, 180.0)
+        if abs(latitude) + latitude_delta < 90.0:
+            longitude_delta = degrees(asin(min(1.0, sin(radians(latitude_delta)) / cos(radians(latitude)))))
+            longitude_range = (longitude - longitude_delta, longitude + longitude_delta)
+        return [position for position in self.within((latitude - latitude_delta, latitude + latitude_delta), longitude_range)
+                if great_circle_distance(latitude, longitude, self.latitude[position], self.longitude[position]) <= radius]
+
+class FileIndex(object):
+    __slots__ = ('file_size', 'file_mtime', 'message_offsets', 'message_number', 'subset_number', 'bit_offset',
+                 'latitude', 'longitude', 'station_id', 'observation_time', 'message_time_range',
+                 '__spatial_index__', '__station_index__')
+    index_keys = tuple([key for pair in location_keys for key in pair]) + station_keys + time_keys
+
+    def __init__(self, file_size=None, file_mtime=None, message_offsets=None, message_number=None, subset_number=None,
+                 bit_offset=None, latitude=None, longitude=None, station_id=None, observation_time=None, message_time_range=None):
+        self.file_size = file_size
+        self.file_mtime = file_mtime
+        self.message_offsets = [] if message_offsets is None else message_offsets
+        self.message_number = [] if message_number is None else message_number
+        self.subset_number = [] if subset_number is None else subset_number
+        self.bit_offset = [] if bit_offset is None else bit_offset
+        self.latitude = [] if latitude is None else latitude
+        self.longitude = [] if longitude is None else longitude
+        self.station_id = [] if station_id is None else station_id
+        self.observation_time = [] if observation_time is None else observation_time
+        self.message_time_range = [] if message_time_range is None else message_time_range
+        self.__spatial_index__ = None
+        self.__station_index__ = None
+
+    def __len__(self):
+        return len(self.message_number)
+
+    @staticmethod
+    def build(bufr_file):
+        index = FileIndex(*file_identity(bufr_file.filename))
+        for message_number, message in enumerate(bufr_file.messages):
+            index.message_offsets.append(int(message.handle.offset))
+            cycle_time = message_cycle_time(message)
+            first_position = len(index)
+            for subset_number, bit_offset, values in message.scan_subsets(FileIndex.index_keys):
+                index.append(message_number, subset_number, bit_offset, values, cycle_time)
+            times = [x for x in index.observation_time[first_position:] if x is not None]
+            index.message_time_range.append([min(times), max(times)] if len(times) > 0 else None)
+        return index
+
+    def append(self, message_number, subset_number, bit_offset, values, cycle_time=None):
+        latitude, longitude = subset_location(values)
+        self.message_number.append(message_number)
+        self.subset_number.append(subset_number)
+        self.bit_offset.append(None if bit_offset is None else int(bit_offset))
+        self.latitude.append(latitude)
+        self.longitude.append(longitude)
+        self.station_id.append(subset_station(values))
+        self.observation_time.append(subset_time(values, cycle_time))
+
+    def matches(self, bufr_file):
+        return ((self.file_size, self.file_mtime) == file_identity(bufr_file.filename)
+                and self.message_offsets == [int(message.handle.offset) for message in bufr_file.messages])
+
+    @staticmethod
+    def read(filename):
+        with open(filename, 'r') as in_file:
+            content = load(in_file)
+        index = FileIndex(**dict([(x, content.get(x, None)) for x in FileIndex.__slots__ if x[0] != '_']))
+        if len(index.station_id) != len(index) or len(index.observation_time) != len(index):
+            index.file_size = None
+        return index
+
+    def write(self, filename):
+        with open(filename, 'w') as out_file:
+            dump(dict([(x, getattr(self, x)) for x in self.__slots__ if x[0] != '_']), out_file)
+
+    @property
+    def spatial(self):
+        if self.__spatial_index__ is None:
+            self.__spatial_index__ = SpatialIndex(self.latitude, self.longitude)
+        return self.__spatial_index__
+
+    @property
+    def stations(self):
+        if self.__station_index__ is None:
+            self.__station_index__ = {}
+            for position, station_id in enumerate(self.station_id):
+                if station_id is not None:
+                    self.__station_index__.setdefault(station_id, []).append(position)
+        return self.__station_index__
+
+    def station(self, *station_ids):
+        return sorted([position for station_id in station_ids for position in self.stations.get(str(station_id).strip(), [])])
+
+    @property
+    def times(self):
+        return datetime_array(self.observation_time)
+
+    def between(self, start_time, end_time):
+        start_time = epoch_seconds(start_time)
+        end_time = epoch_seconds(end_time)
+        positions = []
+        for message_number, time_range in enumerate(self.message_time_range):
+            if time_range is None or time_range[1] < start_time or time_range[0] > end_time:
+                continue
+            first_position = bisect_left(self.message_number, message_number)
+            last_position = bisect_right(self.message_number, message_number)
+            positions.extend([position for position in range(first_position, last_position)
+                              if self.observation_time[position] is not None
+                              and start_time <= self.observation_time[position] <= end_time])
+        return positions
+
+    def locations(self, positions):
+        return [(self.message_number[i], self.subset_number[i], self.bit_offset[i]) for i in positions]
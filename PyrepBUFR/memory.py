@@ -0,0 +1,145 @@
+from os import sysconf
+from sys import getsizeof, platform
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start, stop
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+
+from . import BUFRFile, decode_message
+from .stats import DecodeStats, StageTimer
+from .tables import BUFRTableObjectBase
+from .tables.default import default_table
+from .values import MessageCollection
+
+try:
+    from resource import RUSAGE_SELF, getrusage
+except ImportError:
+    getrusage = None
+
+shared_types = (BUFRTableObjectBase, type, ModuleType, FunctionType, BuiltinFunctionType, MethodType, bool, type(None))
+
+def peak_rss():
+    if getrusage is None:
+        return None
+    return getrusage(RUSAGE_SELF).ru_maxrss * (1 if platform == 'darwin' else 1024)
+
+def current_rss():
+    try:
+        with open('/proc/self/statm', 'r') as in_file:
+            return int(in_file.read().split()[1]) * sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def walk(root, seen, skip_types):
+    pending = [root]
+    while len(pending) > 0:
+        item = pending.pop()
+        if id(item) in seen or issubclass(item.__class__, skip_types):
+            continue
+        seen.add(id(item))
+        yield item
+        if issubclass(item.__class__, dict):
+            pending.extend(dict.keys(item))
+            pending.extend(dict.values(item))
+        elif issubclass(item.__class__, (list, tuple, set, frozenset)):
+            pending.extend(list.__iter__(item) if issubclass(item.__class__, list) else item)
+        for cls in item.__class__.__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for name in ((slots,) if type(slots) == str else slots):
+                if name != '__dict__' and hasattr(item, name):
+                    pending.append(getattr(item, name))
+        if hasattr(item, '__dict__'):
+            pending.append(item.__dict__)
+
+def shared_objects(*roots):
+    seen = set()
+    for root in roots:
+        for item in walk(root, seen, shared_types[1:]):
+            pass
+    return seen
+
+def object_sizes(root, sizes=None, seen=None):
+    sizes = {} if sizes is None else sizes
+    for item in walk(root, set() if seen is None else seen, shared_types):
+        entry = sizes.setdefault(item.__class__.__name__, [0, 0])
+        entry[0] += 1
+        entry[1] += getsizeof(item)
+    return sizes
+
+def total_size(sizes):
+    return sum([x[1] for x in sizes.values()])
+
+class MemoryTimer(StageTimer):
+    __slots__ = ('start_memory', 'peak_memory')
+    def __enter__(self):
+        current_memory, peak_memory = get_traced_memory()
+        if len(self.stats.__stack__) > 0:
+            self.stats.__stack__[-1].peak_memory = max(self.stats.__stack__[-1].peak_memory, peak_memory)
+        self.start_memory = current_memory
+        self.peak_memory = current_memory
+        reset_peak()
+        self.stats.__stack__.append(self)
+        return super().__enter__()
+    def __exit__(self, type, value, tb):
+        super().__exit__(type, value, tb)
+        current_memory, peak_memory = get_traced_memory()
+        self.stats.__stack__.pop()
+        entry = self.stats.memory.setdefault(self.name, {'calls': 0, 'peak_bytes': 0, 'retained_bytes': 0, 'peak_rss': None, 'rss': None})
+        entry['calls'] += 1
+        entry['peak_bytes'] = max(entry['peak_bytes'], max(self.peak_memory, peak_memory) - self.start_memory)
+        entry['retained_bytes'] += current_memory - self.start_memory
+        entry['peak_rss'] = peak_rss()
+        entry['rss'] = current_rss()
+        return False
+
+class MemoryStats(DecodeStats):
+    __slots__ = ('memory', '__stack__', '__started__')
+    def __init__(self, callback=None):
+        super().__init__(callback)
+        self.memory = {}
+        self.__stack__ = []
+        self.__started__ = not is_tracing()
+        if self.__started__:
+            start()
+    def timer(self, name):
+        return MemoryTimer(self, name)
+    def reset(self):
+        super().reset()
+        self.memory = {}
+    def stop(self):
+        if self.__started__ and is_tracing():
+            stop()
+        self.__started__ = False
+    def to_dict(self):
+        output = super().to_dict()
+        output['memory'] = dict([(name, dict(entry)) for name, entry in self.memory.items()])
+        return output
+
+def memory_report(filename, table_source=default_table, events='all', rows=True):
+    stats = MemoryStats()
+    report = {'filename': filename if type(filename) == str else None, 'events': events, 'messages': [], 'classes': {}}
+    try:
+        with BUFRFile(filename, table_source=table_source, events=events, stats=stats) as bufr_file:
+            collection = MessageCollection(stats=stats)
+            seen = shared_objects(*[message.tables for message in bufr_file.messages])
+            for message_number, message in enumerate(bufr_file.messages):
+                subsets = decode_message(message_number, message, events)
+                sizes = object_sizes(subsets, seen=seen)
+                for name, (count, size) in sizes.items():
+                    entry = report['classes'].setdefault(name, {'count': 0, 'bytes': 0})
+                    entry['count'] += count
+                    entry['bytes'] += size
+                message_bytes = total_size(sizes)
+                report['messages'].append({'message_number': message_number, 'subsets': subsets.__list_len__(), 'bytes': message_bytes,
+                                           'bytes_per_subset': message_bytes / max(subsets.__list_len__(), 1)})
+                collection.append(subsets)
+            if rows:
+                report['row_bytes'] = total_size(object_sizes(collection.to_dict(), seen=seen))
+    finally:
+        stats.stop()
+    report['bytes'] = sum([x['bytes'] for x in report['messages']])
+    report['subsets'] = sum([x['subsets'] for x in report['messages']])
+    report['bytes_per_subset'] = report['bytes'] / max(report['subsets'], 1)
+    report['values'] = stats.counters.get('values', 0)
+    report['bytes_per_value'] = report['bytes'] / max(report['values'], 1)
+    report['stages'] = stats.to_dict()['memory']
+    report['peak_rss'] = peak_rss()
+    return report
@@ -28,7 +28,7 @@ class Operator05(Operator):
 
     @property
     def bit_width(self):
-        return self.id.y * 8
+        return int(self.id.y) * 8
 
 class Operator06(Operator):
     mnemonic = "OPER6"
@@ -0,0 +1,46 @@
+from .replication import Replication
+
+def match_value(condition, value):
+    if value is None:
+        return False
+    if callable(condition):
+        return bool(condition(value))
+    if type(condition) == tuple:
+        return condition[0] <= value <= condition[1]
+    if type(condition) in (list, set, frozenset):
+        return value in condition
+    return value == condition
+
+def match_record(predicates, record):
+    return min([key in record and match_value(condition, record[key]) for key, condition in predicates.items()] + [True])
+
+def descriptor_mnemonics(descriptors):
+    subset_level = set()
+    value_level = set()
+    pending = [(descriptor, True) for descriptor in descriptors]
+    while len(pending) > 0:
+        descriptor, top_level = pending.pop()
+        if issubclass(descriptor.__class__, Replication):
+            pending.extend([(element, False) for element in descriptor.data_elements])
+        elif top_level:
+            subset_level.add(descriptor.mnemonic)
+        else:
+            value_level.add(descriptor.mnemonic)
+    return subset_level, value_level
+
+def split_predicates(where, header_keys, descriptors):
+    subset_level, value_level = descriptor_mnemonics(descriptors)
+    header_predicates = {}
+    subset_predicates = {}
+    value_predicates = {}
+    missing_keys = []
+    for key, condition in where.items():
+        if key in header_keys:
+            header_predicates[key] = condition
+        elif key in subset_level:
+            subset_predicates[key] = condition
+        elif key in value_level:
+            value_predicates[key] = condition
+        else:
+            missing_keys.append(key)
+    return header_predicates, subset_predicates, value_predicates, missing_keys
@@ -1,8 +1,9 @@
 from collections import namedtuple
 from re import sub
 
+from .external import array, float64, nan
 from .tables import ElementDefinition, parse_int
-from .values import ReplicationGroup, ReplicationSequence
+from .values import BUFRLookupTable, EventHistory, EventSequence, ReplicationGroup, ReplicationSequence
 
 class Replication(ElementDefinition):
     __slots__ = ('id', 'data_elements')
@@ -18,7 +19,7 @@ class Replication(ElementDefinition):
         self.data_elements = data_elements
     def __repr__(self):
         base = super().__repr__()
-        return base[:base.find(', data_elements')] + ', \n    replication_count={0}, \n    data_elements=[\n        {1}\n    ]\n)'.format(self.x, ',\n        '.join([repr(x) for x in self.data_elements]))
+        return base[:base.find(', data_elements')] + ', \n    replication_count={0}, \n    data_elements=[\n        {1}\n    ]\n)'.format(self.y, ',\n        '.join([repr(x) for x in self.data_elements]))
     def __str__(self):
         return super().__str__() + '\n ' + '\n '.join([str(x) for x in self.data_elements])
     def read_replication(self, bit_map, count):
@@ -26,11 +27,39 @@ class Replication(ElementDefinition):
         for i in range(count):
             values = ReplicationSequence()
             for element in self.data_elements:
-                values.append(element.read_value(bit_map))
+                value = element.read_value(bit_map)
+                if value.__class__ == EventSequence:
+                    values.extend(value)
+                else:
+                    values.append(value)
             output.append(values)
         return output
     def read_value(self, bit_map):
-        return self.read_replication(bit_map, self.x)
+        return self.read_replication(bit_map, self.y)
+    def read_compressed_replication(self, bit_map, count, number_of_subsets):
+        output = [ReplicationGroup(self) for i in range(number_of_subsets)]
+        for i in range(count):
+            sequences = [ReplicationSequence() for j in range(number_of_subsets)]
+            for element in self.data_elements:
+                for values, value in zip(sequences, element.read_compressed(bit_map, number_of_subsets)):
+                    if value.__class__ == EventSequence:
+                        values.extend(value)
+                    else:
+                        values.append(value)
+            for group, values in zip(output, sequences):
+                group.append(values)
+        return output
+    def read_compressed(self, bit_map, number_of_subsets):
+        return self.read_compressed_replication(bit_map, self.y, number_of_subsets)
+    def skip_replication(self, bit_map, count):
+        if len([x for x in self.data_elements if issubclass(x.__class__, Replication)]) == 0:
+            bit_map.seek(bit_map.cursor + int(count) * sum([int(x.bit_width) for x in self.data_elements]))
+        else:
+            for i in range(count):
+                for element in self.data_elements:
+                    element.skip_value(bit_map)
+    def skip_value(self, bit_map):
+        self.skip_replication(bit_map, self.y)
     
 class DelayedReplication(Replication):
     __slots__ = ('id', 'data_elements', 'replication_element', )
@@ -45,4 +74,51 @@ class DelayedReplication(Replication):
         return sub(r'replication_count=[^\s]*', 'replication_element={0}'.format(repr(self.replication_element)), base)
     def read_value(self, bit_map):
         n = self.replication_element.read_value(bit_map)
-        return self.read_replication(bit_map, n.data)
\ No newline at end of file
+        return self.read_replication(bit_map, n.data)
+    def skip_value(self, bit_map):
+        n = self.replication_element.read_value(bit_map)
+        self.skip_replication(bit_map, n.data)
+    def read_compressed(self, bit_map, number_of_subsets):
+        n = self.replication_element.read_compressed(bit_map, number_of_subsets)[0]
+        return self.read_compressed_replication(bit_map, n.data, number_of_subsets)
+
+event_modes = ('all', 'latest', 'history')
+
+def check_events(events):
+    if events not in event_modes:
+        raise ValueError('Event mode must be one of {0:s}, not \'{1}\''.format(', '.join(event_modes), events))
+    return events
+
+class EventStack(DelayedReplication):
+    __slots__ = ('id', 'data_elements', 'replication_element', 'mnemonic', 'events')
+    __id_class__ = namedtuple('EventStackID', ('f', 'x', 'y'))
+    name = 'Event Stack'
+    def __init__(self, f, x, y, data_elements, replication_element, mnemonic='DRPSTAK', events='latest'):
+        super().__init__(f, x, y, data_elements, replication_element)
+        self.mnemonic = mnemonic
+        self.events = check_events(events)
+    def event_sequence(self, history):
+        output = EventSequence()
+        output.extend(history[0] if len(history) > 0 else [element.create_value(None) for element in self.data_elements])
+        if self.events == 'history':
+            output.append(EventHistory(self, tuple([element.mnemonic for element in self.data_elements]),
+                                       array([[nan if x.is_missing else float(x.data_raw if issubclass(x.__class__, BUFRLookupTable) else x.data) for x in event] for event in history], dtype=float64)))
+        return output
+    def read_value(self, bit_map):
+        if len([x for x in self.data_elements if issubclass(x.__class__, Replication)]) > 0:
+            return super().read_value(bit_map)
+        count = self.replication_element.read_value(bit_map).data
+        count = 0 if count is None else int(count)
+        if self.events == 'history':
+            history = [[element.read_value(bit_map) for element in self.data_elements] for i in range(count)]
+        else:
+            history = [[element.read_value(bit_map) for element in self.data_elements] for i in range(min(count, 1))]
+            self.skip_replication(bit_map, count - len(history))
+        return self.event_sequence(history)
+    def read_compressed(self, bit_map, number_of_subsets):
+        if len([x for x in self.data_elements if issubclass(x.__class__, Replication)]) > 0:
+            return super().read_compressed(bit_map, number_of_subsets)
+        count = self.replication_element.read_compressed(bit_map, number_of_subsets)[0].data
+        count = 0 if count is None else int(count)
+        history = [[element.read_compressed(bit_map, number_of_subsets) for element in self.data_elements] for i in range(count)]
+        return [self.event_sequence([[values[j] for values in event] for event in history]) for j in range(number_of_subsets)]
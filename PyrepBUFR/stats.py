@@ -0,0 +1,93 @@
+from socket import AF_INET, SOCK_DGRAM, socket
+from time import perf_counter
+
+from .values import BUFRLookupTable
+
+class StageTimer(object):
+    __slots__ = ('stats', 'name', 'start_time')
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start_time = None
+    def __enter__(self):
+        self.start_time = perf_counter()
+        return self
+    def __exit__(self, type, value, tb):
+        self.stats.add_time(self.name, perf_counter() - self.start_time)
+        return False
+
+class NullTimer(object):
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, tb):
+        return False
+
+null_timer = NullTimer()
+
+def stage(stats, name):
+    return null_timer if stats is None else stats.timer(name)
+
+def count(stats, name, value=1):
+    if stats is not None:
+        stats.count(name, value)
+
+class DecodeStats(object):
+    __slots__ = ('counters', 'timers', 'callback')
+    def __init__(self, callback=None):
+        self.counters = {}
+        self.timers = {}
+        self.callback = callback
+    def __repr__(self):
+        return 'DecodeStats(counters={0}, timers={1})'.format(self.counters, dict([(k, round(v, 6)) for k, v in self.timers.items()]))
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self.callback('counter', name, value)
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+        if self.callback is not None:
+            self.callback('timer', name, seconds)
+    def timer(self, name):
+        return StageTimer(self, name)
+    def count_subsets(self, subsets):
+        values = lookup_tables = resolved = 0
+        for subset in subsets.__list_iter__():
+            for value in subset:
+                values += 1
+                if issubclass(value.__class__, BUFRLookupTable):
+                    lookup_tables += 1
+                    if value.__lookup_table__ is not None:
+                        resolved += 1
+        self.count('subsets', subsets.__list_len__())
+        self.count('values', values)
+        self.count('lookup_tables', lookup_tables)
+        self.count('lookup_tables_resolved', resolved)
+    def update(self, other):
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for name, seconds in other.timers.items():
+            self.add_time(name, seconds)
+    def reset(self):
+        self.counters = {}
+        self.timers = {}
+    def to_dict(self):
+        return {'counters': dict(self.counters), 'timers': dict(self.timers)}
+
+class StatsdCallback(object):
+    __slots__ = ('address', 'prefix', '__socket__')
+    def __init__(self, host='localhost', port=8125, prefix='pyrepbufr'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.__socket__ = socket(AF_INET, SOCK_DGRAM)
+    def __call__(self, kind, name, value):
+        if kind == 'timer':
+            line = '{0:s}.{1:s}:{2:.3f}|ms'.format(self.prefix, name, value * 1000.0)
+        else:
+            line = '{0:s}.{1:s}:{2:d}|c'.format(self.prefix, name, int(value))
+        try:
+            self.__socket__.sendto(line.encode('ascii'), self.address)
+        except OSError:
+            pass
+    def close(self):
+        self.__socket__.close()
@@ -0,0 +1,102 @@
+from asyncio import Queue, ensure_future, get_running_loop
+from io import BytesIO
+
+from . import BUFRFile, BUFRMessage, decode_message
+from .replication import check_events
+from .tables.default import default_table
+from .utility import read_integer
+
+def decode_message_bytes(message_number, message_bytes, table_key, tables, events='all'):
+    return decode_message(message_number, BUFRMessage(BytesIO(message_bytes), table_source=None, table_cache={table_key: tables}), events)
+
+class AsyncBUFRReader(object):
+    def __init__(self, stream, table_source=default_table, executor=None, max_pending=8, read_size=65536, events='all'):
+        self.__stream__ = stream
+        self.__table_source__ = table_source
+        self.__table_cache__ = {}
+        self.__compact_tables__ = {}
+        self.__executor__ = executor
+        self.__queue__ = Queue(maxsize=max_pending)
+        self.__read_size__ = read_size
+        self.__buffer__ = bytearray()
+        self.__end_of_stream__ = False
+        self.__producer__ = None
+        self.__finished__ = False
+        self.events = check_events(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.__finished__:
+            raise StopAsyncIteration
+        if self.__producer__ is None:
+            self.__producer__ = ensure_future(self.__produce__())
+        item = await self.__queue__.get()
+        if item is None:
+            self.__finished__ = True
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            self.__finished__ = True
+            raise item
+        return await item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.__producer__ is not None and not self.__producer__.done():
+            self.__producer__.cancel()
+
+    async def __fill__(self, size):
+        while len(self.__buffer__) < size and not self.__end_of_stream__:
+            data = await self.__stream__.read(self.__read_size__)
+            if len(data) == 0:
+                self.__end_of_stream__ = True
+            self.__buffer__.extend(data)
+        return len(self.__buffer__) >= size
+
+    async def read_message_bytes(self):
+        start_position = self.__buffer__.find(b'BUFR')
+        while start_position < 0:
+            del self.__buffer__[:max(len(self.__buffer__) - 3, 0)]
+            if not await self.__fill__(len(self.__buffer__) + 1):
+                return None
+            start_position = self.__buffer__.find(b'BUFR')
+        del self.__buffer__[:start_position]
+        if not await self.__fill__(8):
+            return None
+        message_length = read_integer(b'\x00' + bytes(self.__buffer__[4:7]))
+        if not await self.__fill__(message_length):
+            return None
+        message_bytes = bytes(self.__buffer__[:message_length])
+        del self.__buffer__[:message_length]
+        return message_bytes
+
+    def __message_tables__(self, message):
+        key = (id(message.tables[1]), tuple([tuple(x) for x in message.data_descriptors]))
+        if key not in self.__compact_tables__:
+            self.__compact_tables__[key] = message.compact_tables()
+        return self.__compact_tables__[key]
+
+    async def __produce__(self):
+        loop = get_running_loop()
+        message_number = 0
+        try:
+            message_bytes = await self.read_message_bytes()
+            while message_bytes is not None:
+                message = await loop.run_in_executor(None, BUFRMessage, BytesIO(message_bytes), self.__table_source__, 0, self.__table_cache__)
+                if message.data_category == 11:
+                    await loop.run_in_executor(None, BUFRFile.process_prepbufr_table, self.__table_source__, message)
+                    self.__table_cache__ = {}
+                    self.__compact_tables__ = {}
+                else:
+                    await self.__queue__.put(loop.run_in_executor(self.__executor__, decode_message_bytes, message_number, message_bytes, message.table_key, self.__message_tables__(message), self.events))
+                    message_number += 1
+                message_bytes = await self.read_message_bytes()
+            await self.__queue__.put(None)
+        except Exception as exception:
+            await self.__queue__.put(exception)
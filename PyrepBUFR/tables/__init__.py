@@ -46,9 +46,17 @@ def write_xml(xml_tree: Any, filename: str, compress_output:bool=False) -> None:
     out_file.write(xml_tree.to_xml().encode('utf-8'))
     out_file.close()
 
+def rebuild_container(cls, class_args, values):
+    return cls(*class_args, [(value.id, value) for value in values])
+
 class BUFRTableObjectBase(object):
     __slots__ = ()
     __id_class__ = None
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get('__id_class__', None) is not None:
+            cls.__id_class__.__module__ = cls.__module__
+            cls.__id_class__.__qualname__ = cls.__qualname__ + '.__id_class__'
     def __getattribute__(self, __name: str) -> Any:
         try:
             return super().__getattribute__(__name)
@@ -125,6 +133,16 @@ class BUFRTableObjectBase(object):
         if self.is_container:
             class_args += [[obj2dict(deepcopy(value), self.__class__) for value in self.values()]]
         return self.__class__(*class_args)
+    def __reduce__(self):
+        class_args = []
+        slot_offset = 0
+        if 'id' in self.__slots__:
+            class_args.extend(self.id)
+            slot_offset = 1
+        class_args.extend([getattr(self, x, None) for x in self.__slots__[slot_offset:]])
+        if self.is_container:
+            return (rebuild_container, (self.__class__, tuple(class_args), list(self.values())))
+        return (self.__class__, tuple(class_args))
 
 class BUFRTableContainerBase(dict):
     __slots__ = ()
@@ -185,7 +203,7 @@ class TableCollection(BUFRTableObjectBase, BUFRTableContainerBase):
         if not tables.is_empty:
             table = tables.iloc(0)
         else:
-            table = Table.create(table_type, None, None, 1e3)
+            table = Table.create(table_type, None, None, 255)
             self.append(table)
         return table
 
@@ -299,7 +317,8 @@ class ElementDefinition(BUFRTableObjectBase):
     def __str__(self):
         return '{0:01d}-{1:02d}-{2:03d}'.format(*self.id)
     def read_value(self, bit_map):
-        data_bytes = bit_map.read(self.bit_width)
+        return self.create_value(bit_map.read(self.bit_width))
+    def create_value(self, data_bytes):
         if self.unit == "CCITT IA5":
             data_value = BUFRString(self, data_bytes)
         elif self.unit == "Code table":
@@ -309,6 +328,25 @@ class ElementDefinition(BUFRTableObjectBase):
         else:
             data_value = BUFRNumeric(self, data_bytes)
         return data_value
+    def skip_value(self, bit_map):
+        bit_map.seek(bit_map.cursor + int(self.bit_width))
+    def read_compressed(self, bit_map, number_of_subsets):
+        reference = bit_map.read(self.bit_width)
+        increment_width = int.from_bytes(bit_map.read(6), 'big')
+        if increment_width == 0:
+            return [self.create_value(reference) for i in range(number_of_subsets)]
+        if self.unit == "CCITT IA5":
+            return [self.create_value(bit_map.read(increment_width * 8)) for i in range(number_of_subsets)]
+        reference = int.from_bytes(reference, 'big')
+        missing_value = (1 << int(self.bit_width)) - 1
+        missing_increment = (1 << increment_width) - 1
+        byte_width = (int(self.bit_width) + 7) // 8
+        increments = int.from_bytes(bit_map.read(increment_width * number_of_subsets), 'big')
+        output = []
+        for i in range(number_of_subsets - 1, -1, -1):
+            increment = (increments >> (i * increment_width)) & missing_increment
+            output.append(self.create_value((missing_value if increment == missing_increment else reference + increment).to_bytes(byte_width, 'big')))
+        return output
 
 class SequenceDefinition(BUFRTableObjectBase, BUFRTableContainerBase):
     __slots__ = ('id', 'mnemonic', 'name')
@@ -1,18 +1,25 @@
 from copy import deepcopy
+from struct import unpack
 
-from ..external import arange, ceil, frombuffer, isnan, log, min_scalar_type, uint8
+from ..external import arange, array, ceil, cumsum, float64, frombuffer, int64, isnan, log, min_scalar_type, minimum, numpy_found, pack_bits, repeat, uint8, unpack_bits
+
+integer_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
 
 def read_integer(byte_string, big_endian=True, unsigned=True):
+    if not numpy_found:
+        return int.from_bytes(byte_string, 'big' if big_endian else 'little', signed=not unsigned)
     padding = b''
     byte_length = len(byte_string)
     byte_width = uint8(2 ** ceil(log(byte_length) / log(2)))
     if byte_length < byte_width:
-        padding += 'b\x00' * (byte_width - byte_length)
+        padding += b'\x00' * (byte_width - byte_length)
     return frombuffer((padding + byte_string) if big_endian else (byte_string + padding),
                         ('>' if big_endian else '<') + ('u' if unsigned else 'i') + str(byte_width))[0]
 
 def byte_integer(value, bit_length, big_endian=True, unsigned=True):
     byte_width = uint8(2**ceil(log(ceil(bit_length/8)*8)/log(2))//8)
+    if not numpy_found:
+        return (int(value) % (1 << (8 * byte_width)) if unsigned else int(value)).to_bytes(byte_width, 'big' if big_endian else 'little', signed=not unsigned)
     output_dtype = ('>' if big_endian else '<') + ('u' if unsigned else 'i') + str(byte_width)
     value = value.astype(('>' if big_endian else '<') + ('u' if unsigned else 'i') + str(byte_width))
     if value.dtype.descr[0][1] != output_dtype:
@@ -20,14 +27,18 @@ def byte_integer(value, bit_length, big_endian=True, unsigned=True):
     return value.tobytes()
 
 def read_integers(byte_string, byte_width, big_endian=True, unsigned=True):
-    padding = b''
-    byte_length = len(byte_string)
-    for i in arange(byte_length % byte_width):
-        padding += b'\x00'
-    return frombuffer(byte_string + padding,
+    byte_string += b'\x00' * (-len(byte_string) % byte_width)
+    if not numpy_found:
+        format_code = integer_formats[byte_width]
+        return unpack('{0:s}{1:d}{2:s}'.format('>' if big_endian else '<', len(byte_string) // byte_width, format_code if unsigned else format_code.lower()), byte_string)
+    return frombuffer(byte_string,
                         ('>' if big_endian else '<') + ('u' if unsigned else 'i') + str(byte_width))
 
 def get_min_type(value):
+    if isinstance(value, float):
+        return float64(value)
+    if not numpy_found:
+        return value
     return min_scalar_type(value).type(value)
 
 def dict_merge(initial_values, new_values):
@@ -43,4 +54,26 @@ def fill_nan(value_array, replace_value):
     for i in range(len(value_array)):
         if isnan(new_array[i]):
             new_array[i] = replace_value
-    return new_array
\ No newline at end of file
+    return new_array
+
+def encode_section(content, pad=True):
+    length = len(content) + 3
+    padding = length % 2 if pad else 0
+    return (length + padding).to_bytes(3, 'big') + content + b'\x00' * padding
+
+def encode_message(bufr_edition, section_1, section_3, section_4, section_2=b''):
+    body = section_1 + section_2 + section_3 + section_4 + b'7777'
+    return b'BUFR' + (len(body) + 8).to_bytes(3, 'big') + bytes([int(bufr_edition)]) + body
+
+def copy_bits(byte_string, bit_ranges, chunk_width=32):
+    bit_offsets = [int(start) for start, end in bit_ranges if end > start]
+    bit_widths = [int(end - start) for start, end in bit_ranges if end > start]
+    if numpy_found and len(bit_offsets) > 0:
+        bit_offsets = array(bit_offsets, dtype=int64)
+        bit_ends = bit_offsets + array(bit_widths, dtype=int64)
+        counts = (bit_ends - bit_offsets + chunk_width - 1) // chunk_width
+        first_chunk = repeat(cumsum(counts) - counts, counts)
+        chunk_offsets = repeat(bit_offsets, counts) + (arange(int(counts.sum())) - first_chunk) * chunk_width
+        bit_widths = minimum(chunk_offsets + chunk_width, repeat(bit_ends, counts)) - chunk_offsets
+        bit_offsets = chunk_offsets
+    return pack_bits(unpack_bits(byte_string, bit_offsets, bit_widths), bit_widths)
@@ -0,0 +1,83 @@
+from io import FileIO, UnsupportedOperation
+from os import SEEK_CUR, lseek
+from threading import Lock
+
+try:
+    from os import pread
+except ImportError:
+    pread = None
+
+try:
+    from os import copy_file_range
+except ImportError:
+    copy_file_range = None
+
+try:
+    from os import sendfile
+except ImportError:
+    sendfile = None
+
+seek_lock = Lock()
+
+class PathFile(object):
+    __slots__ = ('name', 'closed')
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+    def read_at(self, offset, length):
+        with open(self.name, 'rb') as fobj:
+            return read_at(fobj, offset, length)
+    def close(self):
+        self.closed = True
+
+def read_at(fobj, offset, length):
+    if fobj.__class__ == PathFile:
+        return fobj.read_at(offset, length)
+    if pread is not None and isinstance(getattr(fobj, 'raw', fobj), FileIO):
+        return pread(fobj.fileno(), int(length), int(offset))
+    with seek_lock:
+        fobj.seek(int(offset))
+        return fobj.read(int(length))
+
+
+def file_number(fobj):
+    try:
+        return fobj.fileno()
+    except (AttributeError, OSError, UnsupportedOperation):
+        return None
+
+def kernel_copy(source_fd, destination_fd, offset, length):
+    if copy_file_range is not None:
+        try:
+            return copy_file_range(source_fd, destination_fd, length, offset)
+        except OSError:
+            pass
+    if sendfile is not None:
+        try:
+            return sendfile(destination_fd, source_fd, offset, length)
+        except OSError:
+            pass
+    return 0
+
+def copy_at(source, destination, offset, length, block_size=1 << 24):
+    offset = int(offset)
+    length = int(length)
+    source_fd = file_number(source)
+    destination_fd = file_number(destination)
+    if source_fd is not None and destination_fd is not None:
+        destination.flush()
+        while length > 0:
+            copied = kernel_copy(source_fd, destination_fd, offset, min(length, block_size))
+            if copied == 0:
+                break
+            offset += copied
+            length -= copied
+        if destination.seekable():
+            destination.seek(lseek(destination_fd, 0, SEEK_CUR))
+    while length > 0:
+        block = read_at(source, offset, min(length, block_size))
+        if len(block) == 0:
+            break
+        destination.write(block)
+        offset += len(block)
+        length -= len(block)
@@ -0,0 +1,80 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+from os import makedirs, remove, replace
+from os.path import abspath, basename, commonpath, dirname, exists, getsize, isdir, isfile, join, relpath
+from time import perf_counter
+
+from ... import BUFRFile
+from ...tables import TableCollection, read_xml
+from ...tables.default import default_table
+from .writer import output_extensions, write_records
+
+try:
+    from resource import RLIMIT_AS, setrlimit
+except ImportError:
+    setrlimit = None
+
+ConversionResult = namedtuple('ConversionResult', ('input_path', 'output_path', 'messages', 'rows', 'input_bytes', 'seconds', 'skipped', 'error'))
+
+worker_tables = default_table
+
+def find_input_files(patterns, recursive=False):
+    input_files = {}
+    for pattern in patterns:
+        if isdir(pattern):
+            pattern = join(pattern, '**', '*') if recursive else join(pattern, '*')
+        for filename in sorted(glob(pattern, recursive=recursive)):
+            if isfile(filename):
+                input_files[filename] = None
+    return list(input_files)
+
+def output_names(input_files):
+    names = [basename(x) for x in input_files]
+    if len(set(names)) < len(names):
+        root = commonpath([dirname(abspath(x)) for x in input_files])
+        names = [relpath(abspath(x), root) for x in input_files]
+    return dict(zip(input_files, names))
+
+def output_path(output_name, output_dir, output_format):
+    return join(output_dir, output_name + output_extensions[output_format])
+
+def initialize_worker(table_path=None, memory_limit=None):
+    global worker_tables
+    if table_path is not None:
+        worker_tables = read_xml(table_path)
+    if memory_limit is not None and setrlimit is not None:
+        setrlimit(RLIMIT_AS, (memory_limit * 1024 * 1024, memory_limit * 1024 * 1024))
+
+def convert_file(input_path, output_file, output_format, filter_keys=None, convert_units={}, events='latest'):
+    start_time = perf_counter()
+    messages = rows = 0
+    error = None
+    partial_file = output_file + '.part'
+    try:
+        with BUFRFile(input_path, table_source=TableCollection(list(worker_tables.items())), events=events) as bufr_file:
+            messages = len(bufr_file.messages)
+            records = bufr_file.data.to_dict(filter_keys=filter_keys, convert_units=convert_units)
+        rows = len(records)
+        write_records(records, partial_file, output_format)
+        replace(partial_file, output_file)
+    except (Exception, MemoryError) as exception:
+        error = '{0:s}: {1}'.format(exception.__class__.__name__, exception)
+        if exists(partial_file):
+            remove(partial_file)
+    return ConversionResult(input_path, output_file, messages, rows, getsize(input_path), perf_counter() - start_time, False, error)
+
+def batch_convert(patterns, output_dir, output_format='csv', workers=None, memory_limit=None, table_path=None,
+                  filter_keys=None, convert_units={}, recursive=False, overwrite=False, events='latest'):
+    makedirs(output_dir or '.', exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker, initargs=(table_path, memory_limit)) as executor:
+        futures = []
+        for input_path, output_name in output_names(find_input_files(patterns, recursive=recursive)).items():
+            output_file = output_path(output_name, output_dir, output_format)
+            makedirs(dirname(output_file) or '.', exist_ok=True)
+            if exists(output_file) and not overwrite:
+                yield ConversionResult(input_path, output_file, 0, 0, getsize(input_path), 0.0, True, None)
+            else:
+                futures.append(executor.submit(convert_file, input_path, output_file, output_format, filter_keys, convert_units, events))
+        for future in as_completed(futures):
+            yield future.result()
@@ -1,7 +1,10 @@
-from copy import deepcopy
+from bisect import bisect_left
+from copy import copy
 from datetime import datetime, timedelta
 
-from ...external import arange, arctan2, array, compare, diff, exp, fill_array, float64, hypot, isfinite, isnan, log, logical_and, nan, numpy_found, pi
+from .. import transpose
+from ...index import subset_station
+from ...external import arange, arctan2, argsort, array, compare, cos, diff, exp, fill_array, float64, hypot, inf, isfinite, isnan, log, logical_and, maximum, minimum, nan, numpy_found, pi, sin, where
 
 sat_pressure_0c = 611.2
 molecular_weight_ratio = 0.6219569100577033
@@ -34,9 +37,7 @@ def relative_humidity_from_specific_humidity(pressure, temperature, specific_hum
 def dewpoint_from_specific_humidity(pressure, temperature, specific_humidity, minimum_relative_humidity=0.0000001):
     relative_humidity = relative_humidity_from_specific_humidity(
                                                pressure, temperature, specific_humidity)
-    if isnan(relative_humidity):
-        relative_humidity = minimum_relative_humidity
-    relative_humidity = max(relative_humidity, minimum_relative_humidity)
+    relative_humidity = maximum(where(isnan(relative_humidity), minimum_relative_humidity, relative_humidity), minimum_relative_humidity)
     return dewpoint_from_relative_humidity(temperature, relative_humidity)
 
 def dewpoint_from_relative_humidity(temperature, relative_humidity):
@@ -67,20 +68,213 @@ def virtual_temperature(temperature, mixing_ratio):
 def pressure_to_height_std(pressure):
     return (t0 / gamma) * (1 - (pressure / p0)**(Rd * gamma / g))
 
+def wind_components(speed, direction):
+    return (-speed * sin(direction * pi / 180), -speed * cos(direction * pi / 180))
+
+mandatory_levels = (100000.0, 92500.0, 85000.0, 70000.0, 50000.0, 40000.0, 30000.0, 25000.0, 20000.0, 15000.0, 10000.0,
+                    7000.0, 5000.0, 3000.0, 2000.0, 1000.0)
+
+def interpolate_profile(coordinate, values, targets):
+    points = sorted([(x, y) for x, y in zip(coordinate, values) if isfinite(x) and isfinite(y)], key=lambda point: point[0])
+    x = [point[0] for point in points]
+    output = []
+    for target in targets:
+        upper = bisect_left(x, target)
+        if upper < len(x) and x[upper] == target:
+            output.append(points[upper][1])
+        elif 0 < upper < len(x):
+            (x0, y0), (x1, y1) = points[upper - 1], points[upper]
+            output.append(y0 + (y1 - y0) * (target - x0) / (x1 - x0))
+        else:
+            output.append(nan)
+    return output
+
+def interpolate_column(coordinate, values, targets):
+    if not numpy_found:
+        return [interpolate_profile(x, y, targets) for x, y in zip(coordinate, values)]
+    output = fill_array((coordinate.shape[0], len(targets)), nan)
+    if coordinate.shape[1] == 0:
+        return output
+    valid = isfinite(coordinate) & isfinite(values)
+    rows = arange(coordinate.shape[0])[:, None]
+    order = argsort(where(valid, coordinate, inf), axis=1, kind='stable')
+    x = where(valid, coordinate, inf)[rows, order]
+    y = values[rows, order]
+    count = valid.sum(axis=1)
+    rows = rows[:, 0]
+    for k, target in enumerate(targets):
+        upper = (x < target).sum(axis=1)
+        index = minimum(upper, x.shape[1] - 1)
+        exact = (upper < count) & (x[rows, index] == target)
+        inside = (upper > 0) & (upper < count) & ~exact
+        x0 = where(inside, x[rows, maximum(upper - 1, 0)], 0.0)
+        x1 = where(inside, x[rows, index], 1.0)
+        y0 = where(inside, y[rows, maximum(upper - 1, 0)], 0.0)
+        y1 = where(inside, y[rows, index], 0.0)
+        output[:, k] = where(exact, y[rows, index], where(inside, y0 + (y1 - y0) * (target - x0) / (x1 - x0), nan))
+    return output
+
+def evaluate_rows(function, *columns):
+    if numpy_found:
+        return function(*columns)
+    return [[function(*values) for values in zip(*rows)] for rows in zip(*columns)]
+
+def level_rows(levels, count):
+    if numpy_found:
+        return fill_array((count, len(levels)), 0.0) + array(levels, dtype=float64)
+    return [[float(x) for x in levels] for i in range(count)]
+
+def log_pressure(pressure):
+    return log(where(pressure > 0, pressure, nan))
+
+def interpolate_fields(fields, levels, coordinate='pressure'):
+    if coordinate == 'pressure':
+        targets = [log(x) for x in levels]
+        vertical = evaluate_rows(log_pressure, fields['pressure'])
+    elif coordinate == 'height':
+        targets = [float(x) for x in levels]
+        vertical = fields['height']
+    else:
+        raise ValueError('Unknown vertical coordinate \'{0}\''.format(coordinate))
+    count = len(fields['pressure'])
+    u = interpolate_column(vertical, evaluate_rows(lambda speed, direction: wind_components(speed, direction)[0], fields['wind_speed'], fields['wind_direction']), targets)
+    v = interpolate_column(vertical, evaluate_rows(lambda speed, direction: wind_components(speed, direction)[1], fields['wind_speed'], fields['wind_direction']), targets)
+    output = {
+        'dry_buld_temperature': interpolate_column(vertical, fields['dry_buld_temperature'], targets),
+        'dewpoint_temperature': interpolate_column(vertical, fields['dewpoint_temperature'], targets),
+        'wind_direction': evaluate_rows(wind_direction, u, v),
+        'wind_speed': evaluate_rows(wind_speed, u, v),
+        'omega': interpolate_column(vertical, fields['omega'], targets)
+    }
+    if coordinate == 'pressure':
+        output['pressure'] = level_rows(levels, count)
+        output['height'] = interpolate_column(vertical, fields['height'], targets)
+    else:
+        output['pressure'] = evaluate_rows(exp, interpolate_column(vertical, evaluate_rows(log_pressure, fields['pressure']), targets))
+        output['height'] = level_rows(levels, count)
+    return output
+
+def profile_rows(values, length):
+    if values is None:
+        return padded_array((1, length), nan)
+    if numpy_found:
+        return array(values, dtype=float64).reshape(1, -1)
+    return [[nan if x is None else float(x) for x in values]]
+
 def read_bufr_sounding(bufr_file, ascent_only=False):
     bufr_data = bufr_file.data.to_dict()
     soundings = []
     if 'LTDS' in bufr_data[0]:
         soundings.append(UpperAirSounding(bufr_data, ascent_only=ascent_only))
     elif 'FTIM' in bufr_data[0]:
-        for profile_index in sorted(set([x['FTIM'] for x in bufr_data if 'FTIM' in x])):
-            soundings.append(ModelSounding([x for x in bufr_data if 'FTIM' in x and x['FTIM'] == profile_index], ascent_only=ascent_only))
+        columns = transpose(bufr_data)
+        profiles = {}
+        for i, profile_index in enumerate(columns['FTIM']):
+            if profile_index is not None:
+                profiles.setdefault(profile_index, []).append(i)
+        for profile_index in sorted(profiles):
+            soundings.append(ModelSounding(select_rows(columns, profiles[profile_index]), ascent_only=ascent_only))
 
     return soundings
 
+def read_bufr_sounding_batch(bufr_file, ascent_only=False):
+    return SoundingBatch.from_rows(bufr_file.data.to_dict(), ascent_only=ascent_only)
+
+def group_soundings(bufr_data, ascent_only=False):
+    groups = {}
+    if len(bufr_data) > 0 and 'LTDS' in bufr_data[0]:
+        sounding_class = UpperAirSounding
+        time_keys = ('YEAR', 'MNTH', 'DAYS', 'HOUR', 'MINU', 'SECO')
+    else:
+        sounding_class = ModelSounding
+        time_keys = ('FTIM',)
+    for row in bufr_data:
+        key = (sounding_station(row), tuple([row.get(x, None) for x in time_keys]))
+        if key[0] is not None and None not in key[1]:
+            groups.setdefault(key, []).append(row)
+    return dict([((key[0], key[1][0] if len(key[1]) == 1 else datetime(*key[1])), sounding_class(rows, ascent_only=ascent_only))
+                 for key, rows in groups.items()])
+
+def sounding_station(row):
+    station_id = subset_station(row)
+    if station_id is None and row.get('STNM', None) is not None:
+        station_id = str(row['STNM'])
+    return station_id
+
+def padded_array(shape, value, dtype=float64):
+    if numpy_found:
+        return fill_array(shape, value).astype(dtype)
+    if len(shape) > 1:
+        return [padded_array(shape[1:], value, dtype) for i in range(shape[0])]
+    return fill_array(shape[0], value)
+
+def evaluate(function, *columns):
+    if numpy_found:
+        return function(*columns)
+    return [function(*values) for values in zip(*columns)]
+
+def select_rows(columns, rows):
+    return dict([(key, [values[i] for i in rows]) for key, values in columns.items()])
+
+def row_count(columns):
+    return max([len(values) for values in columns.values()] + [0])
+
+def row_value(columns, key, row):
+    return columns[key][row] if key in columns else None
+
+def column_array(columns, key, order=None):
+    order = range(row_count(columns)) if order is None else order
+    values = columns.get(key, None)
+    if values is None:
+        return fill_array(len(order), nan, dtype=float64)
+    if numpy_found:
+        return array(values, dtype='float64')[order]
+    return [nan if values[i] is None else float(values[i]) for i in order]
+
+def sort_order(values, reverse=False):
+    if numpy_found:
+        index = arange(len(values))[isfinite(values)]
+        return index[argsort(-values[index] if reverse else values[index], kind='stable')]
+    return sorted([i for i, x in enumerate(values) if isfinite(x)], key=lambda i: values[i], reverse=reverse)
+
 def clear_empty_array(test_array):
+    if numpy_found:
+        return None if len(test_array) > 0 and isnan(test_array).all() else test_array
     return None if set([None if isnan(x) else x for x in test_array]) == {None} else test_array
 
+def is_ascending(height, pressure, left, right):
+    if left < 0:
+        return height[right] - (height[right] - 1) > 0 and pressure[right] - (pressure[right] + 1) < 0
+    return height[right] - height[left] > 0 and pressure[right] - pressure[left] < 0
+
+def ascent_only_mask(height, pressure):
+    length = len(pressure)
+    if numpy_found and length > 0:
+        height = array(height, dtype='float64')
+        pressure = array(pressure, dtype='float64')
+        dead = (~logical_and(compare(diff(height, n=1, prepend=height[0]-1), '>', 0),
+                             compare(diff(pressure, n=1, prepend=pressure[0]+1), '<', 0))).nonzero()[0].tolist()
+        height = height.tolist()
+        pressure = pressure.tolist()
+    else:
+        dead = [i for i in range(length) if not is_ascending(height, pressure, i - 1, i)]
+    previous = list(range(-1, length - 1))
+    following = list(range(1, length + 1))
+    alive = [True] * length
+    while len(dead) > 0:
+        candidates = []
+        for i in dead:
+            alive[i] = False
+            if previous[i] > -1:
+                following[previous[i]] = following[i]
+            if following[i] < length:
+                previous[following[i]] = previous[i]
+            candidates.append(following[i])
+        dead = [i for i in candidates if i < length and alive[i] and not is_ascending(height, pressure, previous[i], i)]
+    if numpy_found:
+        return arange(length)[array(alive, dtype=bool)]
+    return [i for i in range(length) if alive[i]]
+
 class BUFRSounding(object):
     __slots__ = ('__ascent_only__', '__mask__', 'station_id', 'station_latitude', 'station_longitude', 'station_elevation', 
                  'sounding_datetime', 'pressure', 'height', 'dry_buld_temperature', 'dewpoint_temperature', 'wind_direction', 
@@ -129,44 +323,54 @@ class BUFRSounding(object):
         return new_values
 
     def __get_ascent_only_mask__(self):
-        index = arange(len(self.pressure))
-        height = deepcopy(self.height)
-        pressure = deepcopy(self.pressure)
-        mask = logical_and(compare(diff(height, n=1, prepend=height[0]-1), '>', 0),
-                            compare(diff(pressure, n=1, prepend=pressure[0]+1), '<', 0))
-        while sum(mask) != len(mask):
-            index = array([index[i] for i, x in enumerate(mask) if x])
-            height = array([height[i] for i, x in enumerate(mask) if x])
-            pressure = array([pressure[i] for i, x in enumerate(mask) if x])
-            mask = logical_and(compare(diff(height, n=1, prepend=height[0]-1), '>', 0),
-                                compare(diff(pressure, n=1, prepend=pressure[0]+1), '<', 0))
-        return index
+        return ascent_only_mask(self.height, self.pressure)
+
+    def interpolate(self, levels=None, coordinate='pressure'):
+        levels = mandatory_levels if levels is None else levels
+        length = sounding_levels(self)
+        output = interpolate_fields(dict([(field, profile_rows(getattr(self, field), length)) for field in sounding_fields]), levels, coordinate)
+        sounding = copy(self)
+        sounding.__ascent_only__ = False
+        sounding.__mask__ = None
+        for field in sounding_fields:
+            setattr(sounding, field, clear_empty_array(output[field][0]))
+        return sounding
 
 class ModelSounding(BUFRSounding):
     def __init__(self, bufr_data, ascent_only=False):
         super().__init__(ascent_only=ascent_only)
 
-        content = sorted([x for x in bufr_data if 'PRES' in x and x['PRES'] is not None and isfinite(x['PRES']) and x['PRES'] > 50], key=lambda a: a['PRES'], reverse=True)
-
-        if 'RPID' in content[0] and content[0]['RPID'] is not None and content[0]['RPID'] != '':
-            self.station_id = content[0]['RPID']
-        elif content[0]['STNM'] is not None:
-            self.station_id = str(content[0]['STNM'])
-
-        self.station_latitude = content[0]['CLAT']
-        self.station_longitude = content[0]['CLON']
-        self.station_elevation = content[0]['GELV']
-        self.sounding_datetime = datetime(content[0]['nominal_year'], content[0]['nominal_month'], content[0]['nominal_day'], content[0]['nominal_hour'], content[0]['nominal_minute'], content[0]['nominal_second']) + timedelta(seconds=int(content[0]['FTIM']))
-
-        self.pressure = clear_empty_array(array([x['PRES'] if 'PRES' in x else None for x in content], dtype='float64'))
-        self.height = clear_empty_array(array([ x['GELV'] - pressure_to_height_std(x['PRSS']) + pressure_to_height_std(x['PRES']) if 'GELV' in x and 'PRSS' in x and 'PRES' in x else None for x in content], dtype='float64'))
-        self.dry_buld_temperature = clear_empty_array(array([x['TMDB'] if 'TMDB' in x else None for x in content], dtype='float64'))
-        self.dewpoint_temperature = clear_empty_array(array([dewpoint_from_specific_humidity(x['PRES'], x['TMDB'], x['SPFH']) if 'PRES' in x and 'TMDB' in x and 'SPFH' in x else None for x in content], dtype='float64'))
-        self.wind_direction = clear_empty_array(array([wind_direction(x['UWND'], x['VWND']) if 'UWND' in x and 'VWND' in x else None for x in content], dtype='float64'))
-        self.wind_speed = clear_empty_array(array([wind_speed(x['UWND'], x['VWND']) if 'UWND' in x and 'VWND' in x else None for x in content], dtype='float64'))
-        self.omega = clear_empty_array(array([x['OMEG'] if 'OMEG' in x else None for x in content], dtype='float64'))
+        columns = bufr_data if type(bufr_data) == dict else transpose(bufr_data)
+        order = sort_order(evaluate(lambda p: where(p > 50, p, nan), column_array(columns, 'PRES')), reverse=True)
+        first = order[0]
+
+        if row_value(columns, 'RPID', first) is not None and row_value(columns, 'RPID', first) != '':
+            self.station_id = row_value(columns, 'RPID', first)
+        elif row_value(columns, 'STNM', first) is not None:
+            self.station_id = str(row_value(columns, 'STNM', first))
+
+        self.station_latitude = row_value(columns, 'CLAT', first)
+        self.station_longitude = row_value(columns, 'CLON', first)
+        self.station_elevation = row_value(columns, 'GELV', first)
+        self.sounding_datetime = datetime(*[row_value(columns, 'nominal_' + x, first) for x in ('year', 'month', 'day', 'hour', 'minute', 'second')]) + timedelta(seconds=int(row_value(columns, 'FTIM', first)))
+
+        pressure = column_array(columns, 'PRES', order)
+        temperature = column_array(columns, 'TMDB', order)
+        specific_humidity = column_array(columns, 'SPFH', order)
+        u = column_array(columns, 'UWND', order)
+        v = column_array(columns, 'VWND', order)
+
+        self.pressure = clear_empty_array(pressure)
+        self.height = clear_empty_array(evaluate(lambda elevation, surface_pressure, p: elevation - pressure_to_height_std(surface_pressure) + pressure_to_height_std(p),
+                                                 column_array(columns, 'GELV', order), column_array(columns, 'PRSS', order), pressure))
+        self.dry_buld_temperature = clear_empty_array(temperature)
+        self.dewpoint_temperature = clear_empty_array(evaluate(dewpoint_from_specific_humidity, pressure, temperature, specific_humidity))
+        self.wind_direction = clear_empty_array(evaluate(wind_direction, u, v))
+        self.wind_speed = clear_empty_array(evaluate(wind_speed, u, v))
+        self.omega = clear_empty_array(column_array(columns, 'OMEG', order))
         if self.omega is None:
-            self.omega = clear_empty_array(array([vertical_velocity_pressure_specific_humidity(x['VVEL'] / 100.0, x['PRES'], x['TMDB'], x['SPFH']) if 'VVEL' in x and 'PRES' in x and 'TMDB' in x and 'SPFH' in x else None for x in content], dtype='float64'))
+            self.omega = clear_empty_array(evaluate(lambda w, p, t, q: vertical_velocity_pressure_specific_humidity(w / 100.0, p, t, q),
+                                                    column_array(columns, 'VVEL', order), pressure, temperature, specific_humidity))
 
         self.__apply_mask__()
 
@@ -174,21 +378,91 @@ class UpperAirSounding(BUFRSounding):
     def __init__(self, bufr_data, ascent_only=False):
         super().__init__(ascent_only=ascent_only)
 
-        content = sorted(bufr_data, key=lambda a: a['LTDS'] if a['LTDS'] is not None else 9999999999999)
+        columns = bufr_data if type(bufr_data) == dict else transpose(bufr_data)
+        order = sort_order(evaluate(lambda x: where(isnan(x), 9999999999999.0, x), column_array(columns, 'LTDS')))
+        first = order[0]
+
+        if row_value(columns, 'SMID', first) != '':
+            self.station_id = row_value(columns, 'SMID', first)
+
+        self.station_latitude = row_value(columns, 'CLATH', first)
+        self.station_longitude = row_value(columns, 'CLONH', first)
+        self.station_elevation = row_value(columns, 'HSMSL', first)
+        self.sounding_datetime = datetime(*[row_value(columns, x, first) for x in ('YEAR', 'MNTH', 'DAYS', 'HOUR', 'MINU', 'SECO')])
 
-        if content[0]['SMID'] != '':
-            self.station_id = content[0]['SMID']
+        self.pressure = clear_empty_array(column_array(columns, 'PRLC', order))
+        self.height = clear_empty_array(column_array(columns, 'GPH10', order))
+        self.dry_buld_temperature = clear_empty_array(column_array(columns, 'TMDB', order))
+        self.dewpoint_temperature = clear_empty_array(column_array(columns, 'TMDP', order))
+        self.wind_direction = clear_empty_array(column_array(columns, 'WDIR', order))
+        self.wind_speed = clear_empty_array(column_array(columns, 'WSPD', order))
 
-        self.station_latitude = content[0]['CLATH']
-        self.station_longitude = content[0]['CLONH']
-        self.station_elevation = content[0]['HSMSL']
-        self.sounding_datetime = datetime(content[0]['YEAR'], content[0]['MNTH'], content[0]['DAYS'], content[0]['HOUR'], content[0]['MINU'], content[0]['SECO'])       
+        self.__apply_mask__()
+
+sounding_fields = ('pressure', 'height', 'dry_buld_temperature', 'dewpoint_temperature', 'wind_direction', 'wind_speed', 'omega')
+
+def sounding_levels(sounding):
+    return max([0] + [len(getattr(sounding, field)) for field in sounding_fields if getattr(sounding, field) is not None])
+
+class SoundingBatch(object):
+    __slots__ = ('station_id', 'time', 'station_latitude', 'station_longitude', 'station_elevation', 'sounding_datetime',
+                 'mask') + sounding_fields
+    def __init__(self, soundings):
+        self.station_id = sorted(set([key[0] for key in soundings]))
+        self.time = sorted(set([key[1] for key in soundings]))
+        station_index = dict([(x, i) for i, x in enumerate(self.station_id)])
+        time_index = dict([(x, i) for i, x in enumerate(self.time)])
+        level_count = max([0] + [sounding_levels(sounding) for sounding in soundings.values()])
+        shape = (len(self.station_id), len(self.time), level_count)
+
+        self.station_latitude = [None] * shape[0]
+        self.station_longitude = [None] * shape[0]
+        self.station_elevation = [None] * shape[0]
+        self.sounding_datetime = [[None] * shape[1] for i in range(shape[0])]
+        self.mask = padded_array(shape, False, dtype=bool)
+        for field in sounding_fields:
+            setattr(self, field, padded_array(shape, nan))
+
+        for key, sounding in soundings.items():
+            i = station_index[key[0]]
+            j = time_index[key[1]]
+            if self.station_latitude[i] is None:
+                self.station_latitude[i] = sounding.station_latitude
+                self.station_longitude[i] = sounding.station_longitude
+                self.station_elevation[i] = sounding.station_elevation
+            self.sounding_datetime[i][j] = sounding.sounding_datetime
+            levels = sounding_levels(sounding)
+            self.mask[i][j][:levels] = [True] * levels
+            for field in sounding_fields:
+                values = getattr(sounding, field)
+                if values is not None:
+                    getattr(self, field)[i][j][:len(values)] = values
+
+    def __flatten__(self, values):
+        if numpy_found:
+            return where(self.mask, values, nan).reshape(-1, values.shape[-1])
+        return [[x if valid else nan for x, valid in zip(row, mask)]
+                for station, station_mask in zip(values, self.mask) for row, mask in zip(station, station_mask)]
 
-        self.pressure = clear_empty_array(array([x['PRLC'] if 'PRLC' in x else None for x in content], dtype='float64'))
-        self.height = clear_empty_array(array([x['GPH10'] if 'GPH10' in x else None for x in content], dtype='float64'))
-        self.dry_buld_temperature = clear_empty_array(array([x['TMDB'] if 'TMDB' in x else None for x in content], dtype='float64'))
-        self.dewpoint_temperature = clear_empty_array(array([x['TMDP'] if 'TMDP' in x else None for x in content], dtype='float64'))
-        self.wind_direction = clear_empty_array(array([x['WDIR'] if 'WDIR' in x else None for x in content], dtype='float64'))
-        self.wind_speed = clear_empty_array(array([x['WSPD'] if 'WSPD' in x else None for x in content], dtype='float64'))
+    def __unflatten__(self, values):
+        if numpy_found:
+            return values.reshape(len(self.station_id), len(self.time), -1)
+        return [values[i * len(self.time):(i + 1) * len(self.time)] for i in range(len(self.station_id))]
 
-        self.__apply_mask__()
\ No newline at end of file
+    def interpolate(self, levels=None, coordinate='pressure'):
+        levels = mandatory_levels if levels is None else levels
+        output = interpolate_fields(dict([(field, self.__flatten__(getattr(self, field))) for field in sounding_fields]), levels, coordinate)
+        valid_fields = [output[field] for field in sounding_fields if field != coordinate]
+        if numpy_found:
+            mask = isfinite(array(valid_fields)).any(axis=0)
+        else:
+            mask = [[max([isfinite(field[i][k]) for field in valid_fields]) for k in range(len(levels))] for i in range(len(output[coordinate]))]
+        batch = copy(self)
+        batch.mask = self.__unflatten__(mask)
+        for field in sounding_fields:
+            setattr(batch, field, self.__unflatten__(output[field]))
+        return batch
+
+    @staticmethod
+    def from_rows(bufr_data, ascent_only=False):
+        return SoundingBatch(group_soundings(bufr_data, ascent_only=ascent_only))
@@ -0,0 +1,121 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import makedirs, remove, replace
+from os.path import dirname, exists, getsize, isdir, join
+from re import sub
+from shutil import rmtree
+from time import perf_counter
+
+from ... import BUFRFile
+from ...external import array, fill_array, float64, isfinite, numpy_found, where
+from ...tables import TableCollection
+from . import batch
+from .batch import find_input_files, initialize_worker, output_names
+from .reader import evaluate, group_soundings, sounding_levels
+
+ExportResult = namedtuple('ExportResult', ('input_path', 'output_path', 'soundings', 'input_bytes', 'seconds', 'skipped', 'error'))
+
+missing_value = -9999.0
+knots_per_meter_per_second = 3600.0 / 1852.0
+zero_degc = 273.15
+
+header_template = """%TITLE%
+ {title:s}   {year:02d}{month:02d}{day:02d}/{hour:02d}{minute:02d}
+
+   LEVEL       HGHT       TEMP       DWPT       WDIR       WSPD
+-------------------------------------------------------------------
+%RAW%
+"""
+
+row_template = '%8.2f,%10.2f,%10.2f,%10.2f,%10.2f,%10.2f\n'
+
+def spc_column(values, length, scale=1.0, offset=0.0):
+    if values is None:
+        return fill_array(length, missing_value)
+    return evaluate(lambda x: where(isfinite(x), x * scale + offset, missing_value), values)
+
+def spc_columns(sounding):
+    length = sounding_levels(sounding)
+    return [spc_column(sounding.pressure, length, scale=0.01),
+            spc_column(sounding.height, length),
+            spc_column(sounding.dry_buld_temperature, length, offset=-zero_degc),
+            spc_column(sounding.dewpoint_temperature, length, offset=-zero_degc),
+            spc_column(sounding.wind_direction, length),
+            spc_column(sounding.wind_speed, length, scale=knots_per_meter_per_second)]
+
+def format_profile(columns):
+    if numpy_found:
+        values = array(columns, dtype=float64).T.ravel().tolist()
+    else:
+        values = [x for row in zip(*columns) for x in row]
+    return (row_template * len(columns[0])) % tuple(values)
+
+def format_sounding(sounding, title=None):
+    title = title if title is not None else (sounding.station_id if sounding.station_id is not None else '')
+    return (header_template.format(title=title, year=sounding.sounding_datetime.year % 100, month=sounding.sounding_datetime.month,
+                                   day=sounding.sounding_datetime.day, hour=sounding.sounding_datetime.hour,
+                                   minute=sounding.sounding_datetime.minute)
+            + format_profile(spc_columns(sounding)) + '%END%\n')
+
+def write_soundings(soundings, out_file):
+    count = 0
+    for sounding in soundings:
+        if count > 0:
+            out_file.write('\n')
+        out_file.write(format_sounding(sounding))
+        count += 1
+    return count
+
+def sounding_filename(sounding):
+    return '{0:s}_{1:s}.txt'.format(sub(r'[^\w\-]', '_', sounding.station_id if sounding.station_id is not None else 'UNKNOWN'),
+                                    sounding.sounding_datetime.strftime('%y%m%d%H%M'))
+
+def read_soundings(input_path, table_source, ascent_only=False):
+    with BUFRFile(input_path, table_source=table_source) as bufr_file:
+        soundings = group_soundings(bufr_file.data.to_dict(), ascent_only=ascent_only)
+    return [soundings[key] for key in sorted(soundings)]
+
+def remove_output(path):
+    if isdir(path):
+        rmtree(path)
+    elif exists(path):
+        remove(path)
+
+def export_file(input_path, output_path, per_sounding=False, ascent_only=False):
+    start_time = perf_counter()
+    count = 0
+    error = None
+    partial_file = output_path + '.part'
+    try:
+        soundings = read_soundings(input_path, TableCollection(list(batch.worker_tables.items())), ascent_only=ascent_only)
+        if per_sounding:
+            remove_output(partial_file)
+            makedirs(partial_file)
+            for sounding in soundings:
+                with open(join(partial_file, sounding_filename(sounding)), 'w') as out_file:
+                    count += write_soundings([sounding], out_file)
+            remove_output(output_path)
+            replace(partial_file, output_path)
+        else:
+            with open(partial_file, 'w') as out_file:
+                count = write_soundings(soundings, out_file)
+            replace(partial_file, output_path)
+    except (Exception, MemoryError) as exception:
+        error = '{0:s}: {1}'.format(exception.__class__.__name__, exception)
+        remove_output(partial_file)
+    return ExportResult(input_path, output_path, count, getsize(input_path), perf_counter() - start_time, False, error)
+
+def export_files(patterns, output_dir, workers=None, per_sounding=False, ascent_only=False, table_path=None,
+                 memory_limit=None, recursive=False, overwrite=False):
+    makedirs(output_dir or '.', exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker, initargs=(table_path, memory_limit)) as executor:
+        futures = []
+        for input_path, output_name in output_names(find_input_files(patterns, recursive=recursive)).items():
+            output_path = join(output_dir, output_name + ('' if per_sounding else '.txt'))
+            makedirs(dirname(output_path) or '.', exist_ok=True)
+            if exists(output_path) and not overwrite and (per_sounding == isdir(output_path)):
+                yield ExportResult(input_path, output_path, 0, getsize(input_path), 0.0, True, None)
+            else:
+                futures.append(executor.submit(export_file, input_path, output_path, per_sounding, ascent_only))
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,37 @@
+from csv import DictWriter
+
+from ... import external
+
+output_extensions = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'netcdf': '.nc'
+}
+
+def record_fields(records):
+    fields = {}
+    for record in records:
+        fields.update(dict.fromkeys(record))
+    return list(fields)
+
+def write_csv(records, filename):
+    with open(filename, 'w', newline='') as out_file:
+        writer = DictWriter(out_file, fieldnames=record_fields(records))
+        writer.writeheader()
+        writer.writerows(records)
+
+def write_parquet(records, filename):
+    external.DataFrame(records, columns=record_fields(records)).to_parquet(filename)
+
+def write_netcdf(records, filename):
+    external.DataFrame(records, columns=record_fields(records)).to_xarray().to_netcdf(filename)
+
+def write_records(records, filename, output_format):
+    if output_format == 'csv':
+        write_csv(records, filename)
+    elif output_format == 'parquet':
+        write_parquet(records, filename)
+    elif output_format == 'netcdf':
+        write_netcdf(records, filename)
+    else:
+        raise ValueError('Output format \'{0:s}\' is not supported'.format(output_format))
@@ -1,8 +1,13 @@
 from collections.abc import Sequence
 
-from .external import DataFrame, Quantity, units
+from . import external
 from .utility import byte_integer, ceil, dict_merge, get_min_type
 
+def __getattr__(name):
+    if name in external.lazy_imports:
+        return getattr(external, name)
+    raise AttributeError('module \'{0:s}\' has no attribute \'{1:s}\''.format(__name__, name))
+
 unit_substituions = {
     'Hour': 'hour',
     'Minute': 'minute',
@@ -17,6 +22,13 @@ unit_substituions = {
     'M/S': 'm/s'
 }
 
+def rebuild_sequence(cls, items, state):
+    sequence = cls.__new__(cls)
+    list.extend(sequence, items)
+    for name, value in state.items():
+        object.__setattr__(sequence, name, value)
+    return sequence
+
 class BUFRValueBase(object):
     __slots__ = ()
     @property
@@ -54,9 +66,9 @@ class BUFRValue(BUFRValueBase):
         return self.element.mnemonic
     @property
     def is_missing(self):
-        return sum([2**i for i in range(self.element.bit_width)]).to_bytes(len(self.__bytes__), 'big') == self.__bytes__
+        return ((1 << int(self.element.bit_width)) - 1).to_bytes(len(self.__bytes__), 'big') == self.__bytes__
     def set_missing(self):
-        self.__bytes__ = sum([2**i for i in range(self.element.bit_width)]).to_bytes( int(ceil(self.element.bit_width / 8)) , 'big')
+        self.__bytes__ = ((1 << int(self.element.bit_width)) - 1).to_bytes( int(ceil(self.element.bit_width / 8)) , 'big')
     def __repr__(self):
         return '{0:s} {1:s} {2}'.format(self.__class__.__name__, self.mnemonic, str(self.data).replace('\n', '\\n'))
     @property
@@ -83,7 +95,7 @@ class BUFRNumeric(BUFRValue):
     @property
     def unit(self):
         unit = super().unit
-        return units(unit_substituions.get(unit, unit))
+        return external.units(unit_substituions.get(unit, unit))
 
 class BUFRString(BUFRValue):
     @property
@@ -169,17 +181,27 @@ class BUFRSequence(list):
     def __list_len__(self):
         return super().__len__()
 
+    def __reduce__(self):
+        state = {}
+        for cls in self.__class__.__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for name in ((slots,) if type(slots) == str else slots):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        state.update(getattr(self, '__dict__', {}))
+        return (rebuild_sequence, (self.__class__, list(self.__list_iter__()), state))
+
     def value_record(self, key, filter_keys, use_pint, convert_units):
         for item in self.__list_iter__():
             key_value = key(item.element)
             if filter_keys is None or key_value in filter_keys:
                 item_value = item.data
-                if not item.is_missing:
-                    if item.__class__ == BUFRNumeric and (use_pint or key_value in convert_units):
-                        item_value = Quantity(item_value, item.unit)
+                if not item.is_missing and (use_pint or key_value in convert_units):
+                    if item.__class__ == BUFRNumeric:
+                        item_value = external.Quantity(item_value, item.unit)
                     if key_value in convert_units:
                         item_value = item_value.to(convert_units[key_value])
-                    if item_value.__class__ == Quantity and not use_pint:
+                    if item.__class__ == BUFRNumeric and not use_pint:
                         item_value = item_value.magnitude
                 yield (key_value, item_value)
 
@@ -187,7 +209,7 @@ class BUFRSequence(list):
         return dict(self.value_record(key, filter_keys, use_pint, convert_units))
 
     def to_dataframe(self, key=lambda element: element.mnemonic, filter_keys=None, convert_units={}):
-        return DataFrame(self.to_dict(key=key, filter_keys=filter_keys, use_pint=False, convert_units=convert_units))
+        return external.DataFrame(self.to_dict(key=key, filter_keys=filter_keys, use_pint=False, convert_units=convert_units))
 
 class BUFRSequenceCollection(BUFRSequence):
     def __group_0__(self, key=lambda element: element.mnemonic, filter_keys=None, use_pint=False, convert_units={}):
@@ -274,6 +296,36 @@ class ReplicationGroup(BUFRValueBase, BUFRGroup):
 class ReplicationSequence(BUFRSequence):
     pass
 
+class EventSequence(ReplicationSequence):
+    pass
+
+class EventHistory(BUFRValueBase):
+    __slots__ = ('element', 'fields', '__data__')
+    def __init__(self, element, fields, data):
+        self.element = element
+        self.fields = fields
+        self.__data__ = data
+    @property
+    def f(self):
+        return self.element.f
+    @property
+    def x(self):
+        return self.element.x
+    @property
+    def y(self):
+        return self.element.y
+    @property
+    def mnemonic(self):
+        return self.element.mnemonic
+    @property
+    def data(self):
+        return self.__data__
+    @property
+    def is_missing(self):
+        return len(self.__data__) == 0
+    def __repr__(self):
+        return '{0:s} {1:s} {2}'.format(self.__class__.__name__, self.mnemonic, str(self.fields))
+
 class MetadataCollection(BUFRSequenceCollection):
     __slots__ = ('metadata')
 
@@ -291,4 +343,16 @@ class SubsetCollection(MetadataCollection):
     pass
 
 class MessageCollection(MetadataCollection):
-    pass
\ No newline at end of file
+    __slots__ = ('stats')
+
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def to_dict(self, key=lambda element: element.mnemonic, filter_keys=None, use_pint=False, convert_units={}):
+        if self.stats is None:
+            return super().to_dict(key=key, filter_keys=filter_keys, use_pint=use_pint, convert_units=convert_units)
+        with self.stats.timer('rows'):
+            records = super().to_dict(key=key, filter_keys=filter_keys, use_pint=use_pint, convert_units=convert_units)
+        self.stats.count('rows', len(records))
+        return records
\ No newline at end of file
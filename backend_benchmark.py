@@ -0,0 +1,46 @@
+from argparse import ArgumentParser
+from json import dump, load
+from os import environ
+from os.path import abspath, dirname, join
+from subprocess import DEVNULL, run
+from sys import executable
+from tempfile import TemporaryDirectory
+
+from PyrepBUFR.benchmark import datasets, stage_names
+
+def run_backend(backend, arguments, work_dir):
+    output_path = join(work_dir, backend + '.json')
+    environment = dict(environ)
+    environment['PYREPBUFR_BACKEND'] = backend
+    run([executable, join(dirname(abspath(__file__)), 'benchmark.py'), '-o', output_path] + arguments, env=environment, stdout=DEVNULL, check=True)
+    with open(output_path, 'r') as in_file:
+        return load(in_file)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare decoding stage times of the NumPy and pure Python backends')
+    parser.add_argument('-o', '--output', metavar='PATH', action='store', dest='output', type=str, default=None, help='JSON file where results for both backends will be written')
+    parser.add_argument('-s', '--scale', metavar='X', action='store', dest='scale', type=float, default=1.0, help='Multiplier on the number of messages in each synthetic file')
+    parser.add_argument('-r', '--repeat', metavar='N', action='store', dest='repeat', type=int, default=3, help='Number of timed runs for each file')
+    parser.add_argument('datasets', metavar='DATASET', type=str, nargs='*', help='Synthetic files to time, one of {0:s}, default is all of them'.format(', '.join([x.name for x in datasets])))
+
+    args = parser.parse_args()
+    for name in args.datasets:
+        if name not in [x.name for x in datasets]:
+            parser.error('unknown dataset \'{0:s}\''.format(name))
+
+    results = {}
+    with TemporaryDirectory() as work_dir:
+        for backend in ('numpy', 'python'):
+            results[backend] = run_backend(backend, ['-s', str(args.scale), '-r', str(args.repeat)] + args.datasets, work_dir)
+    if results['numpy']['backend'] != 'numpy':
+        print('NumPy is not installed, both runs used the pure Python backend')
+    print('{0:<28s} {1:<8s} '.format('dataset', 'backend') + ' '.join(['{0:>8s}'.format(x) for x in stage_names]) + ' {0:>8s}'.format('total'))
+    for name in results['numpy']['datasets']:
+        for backend in ('numpy', 'python'):
+            result = results[backend]['datasets'][name]
+            print('{0:<28s} {1:<8s} '.format(name, backend) + ' '.join(['{0:8.3f}'.format(result['stages'][stage]['best']) for stage in stage_names]) + ' {0:8.3f}'.format(result['total']))
+        print('{0:<28s} {1:<8s} '.format(name, 'ratio') + ' '.join(['{0:8.2f}'.format(results['python']['datasets'][name]['stages'][stage]['best'] / max(results['numpy']['datasets'][name]['stages'][stage]['best'], 1e-9))
+                                                              for stage in stage_names]) + ' {0:8.2f}'.format(results['python']['datasets'][name]['total'] / max(results['numpy']['datasets'][name]['total'], 1e-9)))
+    if args.output is not None:
+        with open(args.output, 'w') as out_file:
+            dump(results, out_file, indent=1)
@@ -0,0 +1,49 @@
+from argparse import ArgumentParser
+from time import perf_counter
+
+from PyrepBUFR.utility.io.batch import batch_convert
+from PyrepBUFR.utility.io.writer import output_extensions
+
+def report(result):
+    if result.skipped:
+        return '{0:s}: skipped, {1:s} exists'.format(result.input_path, result.output_path)
+    if result.error is not None:
+        return '{0:s}: failed after {1:.2f} s, {2:s}'.format(result.input_path, result.seconds, result.error)
+    return '{0:s}: {1:d} messages, {2:d} rows in {3:.2f} s ({4:.0f} rows/s, {5:.2f} MB/s)'.format(
+        result.input_path, result.messages, result.rows, result.seconds,
+        result.rows / result.seconds, result.input_bytes / 1048576.0 / result.seconds)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Convert many BUFR files to columnar output in parallel')
+    parser.add_argument('-d', '--dir', metavar='PATH', action='store', dest='output_dir', type=str, default='.', help='Directory where converted files will be written, default is current directory')
+    parser.add_argument('-f', '--format', metavar='FORMAT', action='store', dest='output_format', choices=sorted(output_extensions), default='csv', help='Output format, one of csv, parquet or netcdf')
+    parser.add_argument('-w', '--workers', metavar='N', action='store', dest='workers', type=int, default=None, help='Number of worker processes, default is the CPU count')
+    parser.add_argument('-m', '--memory-limit', metavar='MB', action='store', dest='memory_limit', type=int, default=None, help='Address space limit for each worker process in megabytes')
+    parser.add_argument('-t', '--tables', metavar='PATH', action='store', dest='tables', type=str, default=None, help='XML file path containing tables')
+    parser.add_argument('-k', '--keys', metavar='MNEMONICS', action='store', dest='filter_keys', type=str, default=None, help='Comma separated mnemonics to include in the output')
+    parser.add_argument('-c', '--convert', metavar='MNEMONIC=UNIT', action='append', dest='convert_units', default=[], help='Convert a mnemonic to a unit, may be repeated')
+    parser.add_argument('-e', '--events', metavar='MODE', action='store', dest='events', type=str, default='latest', choices=['all', 'latest', 'history'], help='How PREPBUFR event stacks are decoded, default is latest')
+    parser.add_argument('-r', '--recursive', action='store_true', dest='recursive', default=False, help='Search directories recursively')
+    parser.add_argument('--overwrite', action='store_true', dest='overwrite', default=False, help='Convert files whose output already exists')
+    parser.add_argument('inputs', metavar='INPUT', type=str, nargs='+', help='Input files, directories or glob patterns')
+
+    args = parser.parse_args()
+
+    filter_keys = args.filter_keys.split(',') if args.filter_keys is not None else None
+    convert_units = dict([x.split('=', 1) for x in args.convert_units])
+
+    start_time = perf_counter()
+    converted = skipped = failed = rows = 0
+    for result in batch_convert(args.inputs, args.output_dir, output_format=args.output_format, workers=args.workers,
+                                memory_limit=args.memory_limit, table_path=args.tables, filter_keys=filter_keys,
+                                convert_units=convert_units, recursive=args.recursive, overwrite=args.overwrite, events=args.events):
+        print(report(result), flush=True)
+        if result.skipped:
+            skipped += 1
+        elif result.error is not None:
+            failed += 1
+        else:
+            converted += 1
+            rows += result.rows
+    elapsed = perf_counter() - start_time
+    print('{0:d} converted, {1:d} skipped, {2:d} failed, {3:d} rows in {4:.2f} s'.format(converted, skipped, failed, rows, elapsed))
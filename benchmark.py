@@ -0,0 +1,36 @@
+from argparse import ArgumentParser
+from json import dumps
+
+from PyrepBUFR.benchmark import datasets, run_benchmarks, stage_names, write_results
+
+def report(name, result):
+    return '{0:<28s} {1:7d} {2:8d} {3:10d} '.format(name, result['subsets'], result['rows'], result['bytes']) + \
+           ' '.join(['{0:8.3f}'.format(result['stages'][stage]['best']) for stage in stage_names]) + ' {0:8.3f}'.format(result['total'])
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Time each decoding stage on synthetic BUFR and PREPBUFR files')
+    parser.add_argument('-o', '--output', metavar='PATH', action='store', dest='output', type=str, default=None, help='JSON file where results will be written, default prints JSON to standard output')
+    parser.add_argument('-s', '--scale', metavar='X', action='store', dest='scale', type=float, default=1.0, help='Multiplier on the number of messages in each synthetic file')
+    parser.add_argument('-r', '--repeat', metavar='N', action='store', dest='repeat', type=int, default=3, help='Number of timed runs for each file')
+    parser.add_argument('-l', '--label', metavar='TEXT', action='store', dest='label', type=str, default=None, help='Label stored with the results, such as a commit id')
+    parser.add_argument('-m', '--memory', action='store_true', dest='memory', help='Also measure memory used by decoded values and by each stage')
+    parser.add_argument('datasets', metavar='DATASET', type=str, nargs='*', help='Synthetic files to time, one of {0:s}, default is all of them'.format(', '.join([x.name for x in datasets])))
+
+    args = parser.parse_args()
+    for name in args.datasets:
+        if name not in [x.name for x in datasets]:
+            parser.error('unknown dataset \'{0:s}\''.format(name))
+
+    results = run_benchmarks(names=args.datasets or None, scale=args.scale, repeat=args.repeat, label=args.label, memory=args.memory)
+    if args.output is None:
+        print(dumps(results, indent=1))
+    else:
+        write_results(results, args.output)
+        print('{0:<28s} {1:>7s} {2:>8s} {3:>10s} '.format('dataset', 'subsets', 'rows', 'bytes') + ' '.join(['{0:>8s}'.format(x) for x in stage_names]) + ' {0:>8s}'.format('total'))
+        for name, result in results['datasets'].items():
+            print(report(name, result))
+        if args.memory:
+            print('{0:<28s} {1:>12s} {2:>12s} {3:>10s} {4:>12s}'.format('dataset', 'decoded', 'per subset', 'per value', 'rows'))
+            for name, result in results['datasets'].items():
+                print('{0:<28s} {1:12d} {2:12.1f} {3:10.1f} {4:12d}'.format(name, result['memory']['bytes'], result['memory']['bytes_per_subset'],
+                                                                          result['memory']['bytes_per_value'], result['memory']['row_bytes']))
@@ -0,0 +1,73 @@
+from argparse import ArgumentParser
+from io import BytesIO
+from time import perf_counter
+
+from PyrepBUFR import BUFRFile
+from PyrepBUFR.encoder import BUFREncoder, subset_count
+from PyrepBUFR.external import numpy_found
+from PyrepBUFR.tables import TableCollection, read_xml
+from PyrepBUFR.tables.default import default_table
+
+def fresh_tables(table_source):
+    return TableCollection(list(table_source.items()))
+
+def encode_messages(input_path, table_source):
+    totals = dict([(key, 0) for key in ('messages', 'table_messages', 'subsets', 'uncompressed_bytes', 'compressed_bytes', 'fallback_messages')])
+    timings = {'uncompressed': 0.0, 'compressed': 0.0}
+    outputs = {'uncompressed': BytesIO(), 'compressed': BytesIO()}
+    with BUFRFile(input_path, table_source=fresh_tables(table_source)) as bufr_file:
+        for form, output in outputs.items():
+            bufr_file.write_messages(output, predicate=lambda header: False)
+            totals[form + '_bytes'] += output.tell()
+        totals['table_messages'] = len(bufr_file.table_messages)
+        for message in bufr_file.messages:
+            encoder = BUFREncoder.from_message(message)
+            columns = encoder.columns(message.subsets)
+            start_time = perf_counter()
+            uncompressed = encoder.encode(columns, message.file_date)
+            timings['uncompressed'] += perf_counter() - start_time
+            start_time = perf_counter()
+            try:
+                compressed = encoder.encode(columns, message.file_date, compressed=True)
+            except ValueError:
+                compressed = uncompressed
+                totals['fallback_messages'] += 1
+            timings['compressed'] += perf_counter() - start_time
+            outputs['uncompressed'].write(uncompressed)
+            outputs['compressed'].write(compressed)
+            totals['messages'] += 1
+            totals['subsets'] += subset_count(columns)
+            totals['uncompressed_bytes'] += len(uncompressed)
+            totals['compressed_bytes'] += len(compressed)
+    return totals, timings, outputs
+
+def decode_seconds(output, table_source, events='latest'):
+    start_time = perf_counter()
+    with BUFRFile(BytesIO(output.getvalue()), table_source=fresh_tables(table_source), events=events) as bufr_file:
+        bufr_file.data.to_dict()
+    return perf_counter() - start_time
+
+def report(input_path, table_source, events='latest'):
+    totals, timings, outputs = encode_messages(input_path, table_source)
+    lines = ['{0:s}: {1:d} messages, {2:d} table messages, {3:d} subsets, {4:d} messages not compressible'.format(
+        input_path, totals['messages'], totals['table_messages'], totals['subsets'], totals['fallback_messages'])]
+    for form in ('uncompressed', 'compressed'):
+        size = totals[form + '_bytes']
+        decode_time = decode_seconds(outputs[form], table_source, events)
+        lines.append('  {0:>12s}: {1:10d} bytes ({2:5.1f}%), encode {3:7.3f} s ({4:8.1f} subsets/s, {5:6.2f} MB/s), decode {6:7.3f} s ({7:8.1f} subsets/s)'.format(
+            form, size, 100.0 * size / max(totals['uncompressed_bytes'], 1), timings[form], totals['subsets'] / max(timings[form], 1e-9),
+            size / 1e6 / max(timings[form], 1e-9), decode_time, totals['subsets'] / max(decode_time, 1e-9)))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare size and throughput of compressed and uncompressed BUFR output')
+    parser.add_argument('-t', '--tables', metavar='PATH', action='store', dest='tables', type=str, default=None, help='XML file path containing tables')
+    parser.add_argument('-e', '--events', metavar='MODE', action='store', dest='events', type=str, default='latest', choices=['all', 'latest', 'history'], help='How PREPBUFR event stacks are decoded, default is latest')
+    parser.add_argument('inputs', metavar='INPUT', type=str, nargs='+', help='BUFR files to re-encode')
+
+    args = parser.parse_args()
+
+    table_source = default_table if args.tables is None else read_xml(args.tables)
+    print('NumPy backend: {0}'.format(numpy_found))
+    for input_path in args.inputs:
+        print(report(input_path, table_source, args.events), flush=True)
@@ -1,17 +1,26 @@
-from sys import argv
+from argparse import ArgumentParser
+from sys import stdout
 
 from PyrepBUFR import BUFRFile
 from PyrepBUFR.tables import read_xml
 from PyrepBUFR.tables.default import default_table
 
-tables = None
-if len(argv) > 2:
-    tables = read_xml(argv[2])
-else:
-    tables = default_table
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Write a description of every message in a BUFR file')
+    parser.add_argument('-o', '--output', metavar='PATH', action='store', dest='output', type=str, default=None, help='Text file where the dump will be written, default is standard output')
+    parser.add_argument('-x', '--hex-bytes', metavar='N', action='store', dest='hex_bytes', type=int, default=None, help='Number of Section 4 bytes shown in hex for each message, 0 skips the hex dump, default shows all')
+    parser.add_argument('-v', '--values', action='store_true', dest='values', help='Also write the decoded values of each subset')
+    parser.add_argument('-e', '--events', metavar='MODE', action='store', dest='events', type=str, default='all', choices=['all', 'latest', 'history'], help='How PREPBUFR event stacks are decoded')
+    parser.add_argument('input', metavar='INPUT', type=str, help='BUFR file to dump')
+    parser.add_argument('tables', metavar='TABLES', type=str, nargs='?', default=None, help='XML file path containing tables')
 
-bf = BUFRFile(argv[1], table_source=tables)
+    args = parser.parse_args()
 
-print(str(bf))
-
-bf.close()
\ No newline at end of file
+    tables = default_table if args.tables is None else read_xml(args.tables)
+    out_file = stdout if args.output is None else open(args.output, 'w')
+    try:
+        with BUFRFile(args.input, table_source=tables, events=args.events) as bufr_file:
+            bufr_file.write_dump(out_file, hex_bytes=args.hex_bytes, values=args.values)
+    finally:
+        if out_file is not stdout:
+            out_file.close()
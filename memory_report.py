@@ -0,0 +1,51 @@
+from argparse import ArgumentParser
+from json import dump
+
+from PyrepBUFR.memory import memory_report
+from PyrepBUFR.tables import read_xml
+from PyrepBUFR.tables.default import default_table
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024.0 or unit == 'GB':
+            return '{0:.1f} {1:s}'.format(size, unit)
+        size /= 1024.0
+
+def summary(report, classes=10):
+    lines = ['{0:s}: {1:d} messages, {2:d} subsets, {3:d} values'.format(report['filename'] or '<stream>', len(report['messages']), report['subsets'], report['values']),
+             '  decoded: {0:s} ({1:s} per subset, {2:.1f} B per value)'.format(format_bytes(report['bytes']), format_bytes(report['bytes_per_subset']), report['bytes_per_value'])]
+    if 'row_bytes' in report:
+        lines.append('  rows: {0:s}'.format(format_bytes(report['row_bytes'])))
+    if report['peak_rss'] is not None:
+        lines.append('  peak RSS: {0:s}'.format(format_bytes(report['peak_rss'])))
+    lines.append('  {0:<12s} {1:>6s} {2:>12s} {3:>12s} {4:>12s}'.format('stage', 'calls', 'peak', 'retained', 'rss'))
+    for name, entry in report['stages'].items():
+        lines.append('  {0:<12s} {1:6d} {2:>12s} {3:>12s} {4:>12s}'.format(name, entry['calls'], format_bytes(entry['peak_bytes']), format_bytes(entry['retained_bytes']),
+                                                                      '-' if entry['rss'] is None else format_bytes(entry['rss'])))
+    lines.append('  {0:<24s} {1:>10s} {2:>12s}'.format('class', 'count', 'bytes'))
+    for name, entry in sorted(report['classes'].items(), key=lambda x: -x[1]['bytes'])[:classes]:
+        lines.append('  {0:<24s} {1:10d} {2:>12s}'.format(name, entry['count'], format_bytes(entry['bytes'])))
+    lines.append('  {0:<8s} {1:>8s} {2:>12s} {3:>12s}'.format('message', 'subsets', 'bytes', 'per subset'))
+    for entry in report['messages']:
+        lines.append('  {0:8d} {1:8d} {2:>12s} {3:>12s}'.format(entry['message_number'], entry['subsets'], format_bytes(entry['bytes']), format_bytes(entry['bytes_per_subset'])))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Report memory used by decoded BUFR messages and by each decoding stage')
+    parser.add_argument('-t', '--tables', metavar='PATH', action='store', dest='tables', type=str, default=None, help='XML file path containing tables')
+    parser.add_argument('-e', '--events', metavar='MODE', action='store', dest='events', type=str, default='all', choices=['all', 'latest', 'history'], help='How PREPBUFR event stacks are decoded')
+    parser.add_argument('-c', '--classes', metavar='N', action='store', dest='classes', type=int, default=10, help='Number of value classes listed, largest first')
+    parser.add_argument('-o', '--output', metavar='PATH', action='store', dest='output', type=str, default=None, help='JSON file where the full reports will be written')
+    parser.add_argument('--no-rows', action='store_false', dest='rows', help='Skip measuring the row dictionaries built by to_dict')
+    parser.add_argument('inputs', metavar='INPUT', type=str, nargs='+', help='BUFR files to measure')
+
+    args = parser.parse_args()
+
+    table_source = default_table if args.tables is None else read_xml(args.tables)
+    reports = []
+    for input_path in args.inputs:
+        reports.append(memory_report(input_path, table_source=table_source, events=args.events, rows=args.rows))
+        print(summary(reports[-1], classes=args.classes), flush=True)
+    if args.output is not None:
+        with open(args.output, 'w') as out_file:
+            dump(reports, out_file, indent=1)
@@ -0,0 +1,43 @@
+from argparse import ArgumentParser
+from time import perf_counter
+
+from PyrepBUFR.utility.io.spc import export_files
+
+def report(result):
+    if result.skipped:
+        return '{0:s}: skipped, {1:s} exists'.format(result.input_path, result.output_path)
+    if result.error is not None:
+        return '{0:s}: failed after {1:.2f} s, {2:s}'.format(result.input_path, result.seconds, result.error)
+    return '{0:s}: {1:d} soundings in {2:.2f} s ({3:.1f} soundings/s)'.format(
+        result.input_path, result.soundings, result.seconds, result.soundings / result.seconds)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Export soundings from many BUFR files in SPC text format')
+    parser.add_argument('-d', '--dir', metavar='PATH', action='store', dest='output_dir', type=str, default='.', help='Directory where text files will be written, default is current directory')
+    parser.add_argument('-s', '--per-sounding', action='store_true', dest='per_sounding', default=False, help='Write each sounding to its own file in a directory named after the input file')
+    parser.add_argument('-a', '--ascent-only', action='store_true', dest='ascent_only', default=False, help='Remove levels that are not strictly ascending')
+    parser.add_argument('-w', '--workers', metavar='N', action='store', dest='workers', type=int, default=None, help='Number of worker processes, default is the CPU count')
+    parser.add_argument('-m', '--memory-limit', metavar='MB', action='store', dest='memory_limit', type=int, default=None, help='Address space limit for each worker process in megabytes')
+    parser.add_argument('-t', '--tables', metavar='PATH', action='store', dest='tables', type=str, default=None, help='XML file path containing tables')
+    parser.add_argument('-r', '--recursive', action='store_true', dest='recursive', default=False, help='Search directories recursively')
+    parser.add_argument('--overwrite', action='store_true', dest='overwrite', default=False, help='Export files whose output already exists')
+    parser.add_argument('inputs', metavar='INPUT', type=str, nargs='+', help='Input files, directories or glob patterns')
+
+    args = parser.parse_args()
+
+    start_time = perf_counter()
+    exported = skipped = failed = soundings = 0
+    for result in export_files(args.inputs, args.output_dir, workers=args.workers, per_sounding=args.per_sounding,
+                               ascent_only=args.ascent_only, table_path=args.tables, memory_limit=args.memory_limit,
+                               recursive=args.recursive, overwrite=args.overwrite):
+        print(report(result), flush=True)
+        if result.skipped:
+            skipped += 1
+        elif result.error is not None:
+            failed += 1
+        else:
+            exported += 1
+            soundings += result.soundings
+    elapsed = perf_counter() - start_time
+    print('{0:d} exported, {1:d} skipped, {2:d} failed, {3:d} soundings in {4:.2f} s ({5:.1f} soundings/s)'.format(
+        exported, skipped, failed, soundings, elapsed, soundings / elapsed if elapsed > 0 else 0.0))
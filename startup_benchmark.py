@@ -0,0 +1,24 @@
+from argparse import ArgumentParser
+from json import dump
+
+from PyrepBUFR.benchmark.startup import cold_start
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Measure cold start time of PyrepBUFR imports, CLI tools and batch workers')
+    parser.add_argument('-r', '--repeat', metavar='N', action='store', dest='repeat', type=int, default=5, help='Number of fresh interpreters started for each command')
+    parser.add_argument('-n', '--imports', metavar='N', action='store', dest='imports', type=int, default=10, help='Number of slowest module imports listed')
+    parser.add_argument('-o', '--output', metavar='PATH', action='store', dest='output', type=str, default=None, help='JSON file where results will be written')
+
+    args = parser.parse_args()
+
+    results = cold_start(repeat=args.repeat, top=args.imports)
+    print('Optional modules loaded by import PyrepBUFR: {0:s}'.format(', '.join(['{0:s}={1}'.format(k, v) for k, v in results['modules'].items()])))
+    print('{0:<24s} {1:>10s} {2:>10s}'.format('command', 'best (s)', 'median (s)'))
+    for name, result in results['commands'].items():
+        print('{0:<24s} {1:10.3f} {2:10.3f}'.format(name, result['best'], result['median']))
+    print('{0:<48s} {1:>10s}'.format('module', 'cumulative (s)'))
+    for name, seconds in results['imports']:
+        print('{0:<48s} {1:10.3f}'.format(name, seconds))
+    if args.output is not None:
+        with open(args.output, 'w') as out_file:
+            dump(results, out_file, indent=1)